@@ -0,0 +1,200 @@
+# backend/analytics.py
+import calendar
+import threading
+from collections import OrderedDict
+import numpy as np
+from . import database
+
+CATEGORIES = ("fixed", "variable", "total")
+PERCENTILES = (50, 90, 99)
+ANALYTICS_CACHE_SIZE = 16
+
+_cost_dtype = np.dtype([("month", "i4"), ("day", "i1"), ("fixed", "?"), ("amount", "f8")])
+_budget_dtype = np.dtype([("month", "i4"), ("salary", "f8"), ("savings_goal", "f8")])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _month_label(index):
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _values(array, digits=2):
+    """Rounds an array into a JSON-ready list, with None where the value is undefined."""
+    rounded = np.round(array.astype(float), digits)
+    return [None if np.isnan(v) else v for v in rounded.tolist()]
+
+
+def _rolling_mean(series, window):
+    """Trailing mean over up to `window` months; the first months average what exists so far."""
+    cumulative = np.concatenate(([0.0], np.cumsum(series)))
+    ends = np.arange(1, len(series) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def _month_over_month(series):
+    delta = np.diff(series, prepend=np.nan)
+    previous = np.concatenate(([np.nan], series[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(previous > 0, delta / previous * 100, np.nan)
+    return delta, percent
+
+
+def _percentiles(amounts):
+    if len(amounts) == 0:
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(amounts, PERCENTILES))}
+
+
+def _grouped_percentiles(groups, amounts, n_groups, percentiles):
+    """
+    Nearest-rank percentiles of amounts within each group (0..n_groups-1),
+    from one lexsort instead of a loop over groups. Empty groups get NaN.
+    """
+    order = np.lexsort((amounts, groups))
+    sorted_amounts = amounts[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = {}
+    for p in percentiles:
+        offsets = np.ceil(p / 100 * counts).astype(np.int64) - 1
+        picks = np.clip(starts + np.maximum(offsets, 0), 0, max(len(sorted_amounts) - 1, 0))
+        values = sorted_amounts[picks] if len(sorted_amounts) else np.zeros(n_groups)
+        result[f"p{p}"] = np.where(counts > 0, values, np.nan)
+    return result
+
+
+def _projection(costs, first, n_months, month_index, day):
+    """
+    Projects the month-end spend of month_index from its first `day` days.
+    Fixed costs are taken as they are; variable spend is scaled by the share
+    that, on average over the earlier months, had been spent by the same day
+    of the month, falling back to a linear pace without enough history.
+    """
+    days_in_month = calendar.monthrange(month_index // 12, month_index % 12 + 1)[1]
+    in_month = (costs["month"] == month_index) & (costs["day"] <= day)
+    fixed_so_far = costs["amount"][in_month & costs["fixed"]].sum()
+    variable_so_far = costs["amount"][in_month & ~costs["fixed"]].sum()
+
+    # Daily variable spend as an (months x 31) grid, then each earlier month's cumulative share by day
+    variable = ~costs["fixed"] & (costs["month"] < month_index)
+    cells = (costs["month"][variable] - first) * 31 + costs["day"][variable].astype(np.int64) - 1
+    grid = np.bincount(cells, weights=costs["amount"][variable], minlength=n_months * 31).reshape(n_months, 31)
+    month_totals = grid.sum(axis=1)
+    history = month_totals > 0
+    share = None
+    if history.sum() >= 3:
+        shares = np.cumsum(grid[history], axis=1)[:, min(day, 31) - 1] / month_totals[history]
+        share = float(shares.mean())
+
+    if day >= days_in_month:
+        projected_variable, method = variable_so_far, "actual"
+    elif share:
+        projected_variable, method = variable_so_far / share, "history"
+    else:
+        projected_variable, method = variable_so_far / day * days_in_month, "linear"
+
+    return {
+        "month": _month_label(month_index),
+        "day": day,
+        "days_in_month": days_in_month,
+        "method": method,
+        "spent_so_far": round(float(fixed_so_far + variable_so_far), 2),
+        "projected_fixed": round(float(fixed_so_far), 2),
+        "projected_variable": round(float(projected_variable), 2),
+        "projected_total": round(float(fixed_so_far + projected_variable), 2),
+    }
+
+
+def compute_analytics(costs, budgets, window=3, month_index=None, day=None):
+    """
+    Builds the analytics payload from structured arrays of costs
+    (month, day, fixed, amount) and budgets (month, salary, savings_goal).
+    """
+    if len(costs) == 0:
+        return {"months": [], "categories": {}, "percentiles": {}, "savings": [], "projection": None}
+
+    first, last = int(costs["month"].min()), int(costs["month"].max())
+    n_months = last - first + 1
+    offsets = costs["month"] - first
+
+    series = {
+        "fixed": np.bincount(offsets[costs["fixed"]], weights=costs["amount"][costs["fixed"]], minlength=n_months),
+        "variable": np.bincount(offsets[~costs["fixed"]], weights=costs["amount"][~costs["fixed"]], minlength=n_months),
+    }
+    series["total"] = series["fixed"] + series["variable"]
+
+    categories = {}
+    for name in CATEGORIES:
+        delta, percent = _month_over_month(series[name])
+        categories[name] = {
+            "totals": _values(series[name]),
+            "rolling_mean": _values(_rolling_mean(series[name], window)),
+            "mom_delta": _values(delta),
+            "mom_delta_percent": _values(percent, 1),
+        }
+
+    percentiles = {
+        "fixed": _percentiles(costs["amount"][costs["fixed"]]),
+        "variable": _percentiles(costs["amount"][~costs["fixed"]]),
+        "total": _percentiles(costs["amount"]),
+    }
+    monthly = _grouped_percentiles(offsets, costs["amount"], n_months, (50, 90))
+    percentiles["monthly"] = {key: _values(values) for key, values in monthly.items()}
+
+    in_range = (budgets["month"] >= first) & (budgets["month"] <= last)
+    budgets = budgets[in_range]
+    spent = series["total"][budgets["month"] - first]
+    saved = budgets["salary"] - spent
+    savings = [
+        {
+            "month": _month_label(int(m)),
+            "salary": round(float(salary), 2),
+            "spent": round(float(s), 2),
+            "saved": round(float(v), 2),
+            "savings_rate": round(float(v / salary * 100), 1),
+            "savings_goal": round(float(goal), 2),
+            "goal_met": bool(v >= goal),
+        }
+        for m, salary, s, v, goal in zip(budgets["month"], budgets["salary"], spent, saved, budgets["savings_goal"])
+    ]
+
+    projection = None
+    if month_index is not None:
+        projection = _projection(costs, first, n_months, month_index, day)
+
+    return {
+        "months": [_month_label(i) for i in range(first, last + 1)],
+        "window": window,
+        "categories": categories,
+        "percentiles": percentiles,
+        "savings": savings,
+        "projection": projection,
+    }
+
+
+def get_analytics(window=3, year=None, month=None, day=None):
+    """
+    Returns the analytics over the whole ledger, with a month-end projection
+    for year/month as of `day`. Results are memoized per ledger and global
+    data version, so they are recomputed only after the ledger changes.
+    """
+    month_index = int(year) * 12 + int(month) - 1 if year and month and day else None
+    version = database.get_data_version(database.GLOBAL_SCOPE)
+    key = (database.ledger_path(), version, window, month_index, day)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    costs = np.fromiter(database.iter_cost_columns(), dtype=_cost_dtype)
+    budgets = np.fromiter(database.iter_budget_columns(), dtype=_budget_dtype)
+    result = compute_analytics(costs, budgets, window=window, month_index=month_index, day=day)
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > ANALYTICS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -1,59 +1,437 @@
 # backend/app.py
+import calendar
+import functools
+import importlib
+import json
 import os
-from flask import Flask, jsonify, request
-from . import llm
+import sqlite3
+from datetime import date
+from flask import Flask, Response, current_app, jsonify, make_response, request, stream_with_context
+from . import chat_memory
+from . import columnar
 from . import database
+from . import fastpath
+from . import importer
+from . import jobs
+from . import llm_cache
+from . import metrics
+from . import preprocess
 
 
-def create_app():
+class LLMUnavailable(Exception):
+    """Raised when the LLM stack cannot be loaded, e.g. because GOOGLE_API_KEY is not set."""
+
+
+def _get_llm():
+    """
+    Imports backend.llm on first use. The Gemini/LangChain stack is slow to
+    import and needs an API key, so CRUD-only workers and CLI commands never pay for it.
+    """
+    try:
+        return importlib.import_module(".llm", __package__)
+    except (ImportError, ValueError) as e:
+        raise LLMUnavailable(str(e)) from e
+
+
+def _wants_ndjson():
+    return request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+
+
+def _versioned(scope_of, validate=None):
+    """
+    Adds an ETag built from the data version of the scope returned by
+    scope_of(**view_args) and answers a matching If-None-Match with 304
+    before the view, and therefore its query, runs.
+    validate(**view_args), when given, runs first so that a request the view
+    would reject gets its error response rather than a 304.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if validate is not None:
+                error = validate(**kwargs)
+                if error is not None:
+                    return error
+            scope = scope_of(**kwargs)
+            # Versions count per ledger file, so the ledger is part of the tag
+            etag = f"{database.current_ledger()}-{scope}-{database.get_data_version(scope)}"
+            if _wants_ndjson():
+                etag += "-ndjson"
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            response.vary.add("Accept")
+            response.vary.add(database.LEDGER_HEADER)
+            return response
+        return wrapper
+    return decorator
+
+
+def _request_month_scope(**kwargs):
+    year, month = request.args.get("year"), request.args.get("month")
+    if year and month:
+        return database.month_scope(year, month)
+    return database.GLOBAL_SCOPE
+
+
+def _global_scope(**kwargs):
+    return database.GLOBAL_SCOPE
+
+
+def _search_args():
+    """Reads the /api/costs/search arguments, raising ValueError for invalid ones."""
+    text = request.args.get("q", "").strip()
+    if not text:
+        raise ValueError("Missing q parameter")
+    cost_type = request.args.get("cost_type")
+    if cost_type and cost_type not in ["fixed", "variable"]:
+        raise ValueError("Invalid cost type")
+    sort = request.args.get("sort", "rank")
+    if sort not in database.SEARCH_SORTS:
+        raise ValueError("sort must be 'rank' or 'date'")
+    limit = request.args.get("limit", 50, type=int)
+    if not 1 <= limit <= 500:
+        raise ValueError("limit must be between 1 and 500")
+    cursor = request.args.get("cursor")
+    if cursor and (not cursor.isdigit() or not cursor.isascii()):
+        raise ValueError("Invalid cursor")
+    return {
+        "text": text,
+        "limit": limit,
+        "cursor": cursor,
+        "sort": sort,
+        "cost_type": cost_type,
+        "start_date": request.args.get("start_date"),
+        "end_date": request.args.get("end_date"),
+        "prefix_last": request.args.get("prefix", "1") != "0",
+    }
+
+
+def _search_error(**kwargs):
+    try:
+        _search_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return None
+
+
+def _stream_json(rows, chunk_rows=500):
+    """
+    Streams an iterable of dicts as a JSON array, or as NDJSON when the client
+    prefers application/x-ndjson, without materializing the whole result.
+    """
+    ndjson = _wants_ndjson()
+    dumps = current_app.json.dumps
+
+    def generate():
+        buffer = []
+        first = True
+        if not ndjson:
+            yield "["
+        for row in rows:
+            if ndjson:
+                buffer.append(dumps(row) + "\n")
+            else:
+                buffer.append(dumps(row) if first else "," + dumps(row))
+                first = False
+            if len(buffer) >= chunk_rows:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+        if not ndjson:
+            yield "]"
+
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    # stream_with_context keeps the pooled connection checked out until the last chunk
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def _sse_response(events):
+    """Sends (event, data) tuples as server-sent events."""
+    def generate():
+        try:
+            for event, payload in events:
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            print(f"LLM Error: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to get a response from the AI model.'})}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def create_app(config=None):
+    """
+    Builds the app. config, when given, overrides the defaults below before
+    any extension reads them (e.g. to point every file at a scratch directory).
+    """
     app = Flask(__name__, static_folder="../frontend", static_url_path="/")
     app.config.from_mapping(
-        DATABASE=os.path.join(app.instance_path, "financial_tracker.sqlite")
+        DATABASE=os.path.join(app.instance_path, "financial_tracker.sqlite"),
+        DB_POOL_SIZE=8,
+        DB_POOL_TIMEOUT=5.0,
+        DB_BUSY_TIMEOUT_MS=5000,
+        DB_CACHE_SIZE_KB=16384,
+        DB_MMAP_SIZE=256 * 1024 * 1024,
+        # Ledgers other than the default one (chosen with X-Ledger or ?ledger=) are
+        # files in LEDGERS_DIR, created on first use; None keeps a single ledger
+        LEDGERS_DIR=os.path.join(app.instance_path, "ledgers"),
+        DB_MAX_OPEN_LEDGERS=64,
+        BULK_MAX_OPERATIONS=5000,
+        LLM_MAX_CONCURRENCY=4,
+        RECOGNIZE_MAX_FILES=20,
+        # Photos are cropped, downscaled and re-encoded before recognition (needs Pillow)
+        RECOGNIZE_MAX_IMAGE_SIDE=1600,
+        RECOGNIZE_GRAYSCALE=True,
+        RECOGNIZE_AUTOCROP=True,
+        RECOGNIZE_JPEG_QUALITY=80,
+        # PDFs with up to this many pages are read page by page (needs pypdf)
+        RECOGNIZE_MAX_PDF_PAGES=10,
+        TRANSCRIBE_MAX_BYTES=100 * 1024 * 1024,
+        # Longer WAV recordings are transcribed in concurrent, overlapping chunks
+        TRANSCRIBE_CHUNK_SECONDS=60,
+        TRANSCRIBE_CHUNK_OVERLAP_SECONDS=2,
+        LLM_CACHE_PATH=os.path.join(app.instance_path, "llm_cache.sqlite"),
+        LLM_CACHE_MEMORY_ENTRIES=128,
+        LLM_CACHE_MAX_BYTES=64 * 1024 * 1024,
+        LLM_CACHE_TTL=7 * 24 * 3600,
+        CHAT_CONTEXT_TOKEN_BUDGET=2000,
+        CHAT_CONTEXT_TOP_N=25,
+        CHAT_FAST_PATH=True,
+        CHAT_FAST_PATH_MIN_CONFIDENCE=0.8,
+        CHAT_FAST_PATH_MIN_COUNT=2,
+        CHAT_MEMORY_WINDOW=4,
+        CHAT_MEMORY_MAX_SESSIONS=1000,
+        CHAT_MEMORY_IDLE_TTL=3600,
+        # Set to e.g. instance/chat_memory.sqlite to share history across workers and restarts
+        CHAT_MEMORY_PATH=None,
+        # Background recognition and transcription jobs (see /api/jobs)
+        JOBS_PATH=os.path.join(app.instance_path, "jobs.sqlite"),
+        JOBS_SPOOL_DIR=os.path.join(app.instance_path, "job_files"),
+        JOBS_WORKERS=2,
+        JOBS_MAX_ATTEMPTS=3,
+        JOBS_BACKOFF_SECONDS=2.0,
+        JOBS_RESULT_TTL=3600,
+        JOBS_LEASE_SECONDS=600,
+        # Log and count SQL statements slower than this many milliseconds; None turns it off
+        METRICS_SLOW_QUERY_MS=None,
     )
+    if config:
+        app.config.update(config)
     try:
         os.makedirs(app.instance_path)
     except OSError:
         pass
+    if not app.config["TRANSCRIBE_CHUNK_SECONDS"] > app.config["TRANSCRIBE_CHUNK_OVERLAP_SECONDS"] >= 0:
+        raise ValueError("TRANSCRIBE_CHUNK_SECONDS must exceed TRANSCRIBE_CHUNK_OVERLAP_SECONDS, which must not be negative")
 
+    # Each module keeps the objects it configures in app.extensions, and its
+    # get_*() accessor returns the current app's. Threads outside an app context
+    # are handed what they need (the recognition pool) or push one (the job
+    # workers); otherwise they fall back to the most recently configured app's.
     database.init_app(app)
+    llm_cache.init_app(app)
+    chat_memory.init_app(app)
+    metrics.init_app(app)
+    preprocess.init_app(app)
+    jobs.init_app(app)
+
+    @app.errorhandler(database.PoolTimeout)
+    def database_busy(e):
+        print(f"Database Pool Error: {e}")
+        return jsonify({"error": "The database is busy, please retry."}), 503
+
+    @app.errorhandler(database.InvalidLedger)
+    def invalid_ledger(e):
+        return jsonify({"error": str(e)}), 400
+
+    @app.errorhandler(database.InvalidMonth)
+    def invalid_month(e):
+        return jsonify({"error": str(e)}), 400
+
+    @app.errorhandler(database.InvalidDate)
+    def invalid_date(e):
+        return jsonify({"error": str(e)}), 400
+
+    @app.errorhandler(LLMUnavailable)
+    def llm_unavailable(e):
+        print(f"LLM Unavailable: {e}")
+        return jsonify({"error": "The AI assistant is not configured on this server."}), 503
+
+    def _document_files():
+        """Returns (files, None) for the uploaded documents, or (None, error response)."""
+        if 'document_file' not in request.files:
+            return None, (jsonify({"error": "No file provided"}), 400)
+
+        doc_files = [f for f in request.files.getlist('document_file') if f.filename != '']
+
+        if not doc_files:
+            return None, (jsonify({"error": "No selected file"}), 400)
+
+        if len(doc_files) > app.config["RECOGNIZE_MAX_FILES"]:
+            return None, (jsonify({"error": f"At most {app.config['RECOGNIZE_MAX_FILES']} files per request"}), 400)
+        return doc_files, None
+
+    def _audio_file():
+        """Returns (file, None) for the uploaded recording, or (None, error response)."""
+        max_bytes = app.config["TRANSCRIBE_MAX_BYTES"]
+        # Refuse oversized uploads before Werkzeug spools the body
+        if request.content_length and request.content_length > max_bytes:
+            return None, (jsonify({"error": f"Audio uploads are limited to {max_bytes // (1024 * 1024)} MB."}), 413)
+
+        if 'audio_file' not in request.files:
+            return None, (jsonify({"error": "No audio file provided"}), 400)
+
+        audio_file = request.files['audio_file']
+
+        if audio_file.filename == '':
+            return None, (jsonify({"error": "No selected file"}), 400)
+        return audio_file, None
+
+    def _recognize(doc_files):
+        llm = _get_llm()
+        if len(doc_files) == 1:
+            return llm.recognize_expenses_from_file(doc_files[0], max_workers=app.config["LLM_MAX_CONCURRENCY"])
+        return llm.recognize_expenses_from_files(doc_files, max_workers=app.config["LLM_MAX_CONCURRENCY"])
+
+    def _transcribe(audio_file):
+        llm = _get_llm()
+        return llm.transcribe_audio(
+            audio_file,
+            max_bytes=app.config["TRANSCRIBE_MAX_BYTES"],
+            chunk_seconds=app.config["TRANSCRIBE_CHUNK_SECONDS"],
+            overlap_seconds=app.config["TRANSCRIBE_CHUNK_OVERLAP_SECONDS"],
+            max_workers=app.config["LLM_MAX_CONCURRENCY"],
+        )
 
     # --- NEW: API Route for Document Recognition ---
     @app.route("/api/recognize", methods=["POST"])
     def recognize_document():
-        if 'document_file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
+        doc_files, error = _document_files()
+        if error:
+            return error
 
-        doc_file = request.files['document_file']
-
-        if doc_file.filename == '':
-            return jsonify({"error": "No selected file"}), 400
+        # Fails with 503 here rather than as a processing error below
+        _get_llm()
 
         try:
-            # The file is processed in-memory and never saved to disk
-            response_data = llm.recognize_expenses_from_file(doc_file)
-            return jsonify(response_data)
+            # The files are processed in-memory and never saved to disk
+            return jsonify(_recognize(doc_files))
         except Exception as e:
             print(f"Recognition Error: {e}")
             return jsonify({"error": "Failed to process document."}), 500
 
     @app.route("/api/transcribe", methods=["POST"])
     def transcribe_audio():
-        if 'audio_file' not in request.files:
-            return jsonify({"error": "No audio file provided"}), 400
+        audio_file, error = _audio_file()
+        if error:
+            return error
 
-        audio_file = request.files['audio_file']
-
-        if audio_file.filename == '':
-            return jsonify({"error": "No selected file"}), 400
+        llm = _get_llm()
 
         try:
-            # Pass the file object directly to the transcription function
-            transcript_text = llm.transcribe_audio(audio_file)
-            return jsonify({"transcript": transcript_text})
+            return jsonify({"transcript": _transcribe(audio_file)})
+        except llm.AudioTooLarge as e:
+            return jsonify({"error": str(e)}), 413
         except Exception as e:
             print(f"Transcription Error: {e}")
             return jsonify({"error": "Failed to transcribe audio."}), 500
 
+    # Background variants: the upload is queued and the client polls /api/jobs/<id>
+    # They run on the queue's worker threads, under this app's context
+    def _recognize_job(args, files):
+        with app.app_context():
+            try:
+                return _recognize(files)
+            except LLMUnavailable as e:
+                raise jobs.PermanentJobError(str(e))
+
+    def _transcribe_job(args, files):
+        with app.app_context():
+            try:
+                llm = _get_llm()
+            except LLMUnavailable as e:
+                raise jobs.PermanentJobError(str(e))
+            try:
+                return {"transcript": _transcribe(files[0])}
+            except llm.AudioTooLarge as e:
+                raise jobs.PermanentJobError(str(e))
+
+    app.extensions["jobs"].register("recognize", _recognize_job)
+    app.extensions["jobs"].register("transcribe", _transcribe_job)
+
+    def _job_accepted(job_id):
+        response = jsonify({"id": job_id, "status": "queued"})
+        response.status_code = 202
+        response.headers["Location"] = f"/api/jobs/{job_id}"
+        return response
+
+    @app.route("/api/jobs/recognize", methods=["POST"])
+    def submit_recognize_job():
+        doc_files, error = _document_files()
+        if error:
+            return error
+        return _job_accepted(jobs.get_queue().submit("recognize", files=doc_files))
+
+    @app.route("/api/jobs/transcribe", methods=["POST"])
+    def submit_transcribe_job():
+        audio_file, error = _audio_file()
+        if error:
+            return error
+        return _job_accepted(jobs.get_queue().submit("transcribe", files=[audio_file]))
+
+    @app.route("/api/jobs/<job_id>", methods=["GET"])
+    def get_job(job_id):
+        job = jobs.get_queue().get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found or expired"}), 404
+        response = jsonify(job)
+        if job["status"] in ("queued", "running"):
+            # Hint for pollers; results are kept for JOBS_RESULT_TTL seconds once finished
+            response.headers["Retry-After"] = "1"
+        return response
+
+    @app.route("/api/jobs/<job_id>", methods=["DELETE"])
+    def cancel_job(job_id):
+        status = jobs.get_queue().cancel(job_id)
+        if status is None:
+            return jsonify({"error": "Job not found or expired"}), 404
+        return jsonify({"id": job_id, "status": status}), 202 if status == "running" else 200
+
+    @app.route("/api/llm/cache", methods=["GET"])
+    def get_llm_cache_stats():
+        return jsonify(llm_cache.get_cache().snapshot())
+
+    @app.route("/api/metrics", methods=["GET"])
+    def get_metrics():
+        cache_stats = llm_cache.get_cache().snapshot()
+        job_counts = jobs.get_queue().counts()
+        open_ledgers = len(app.extensions.get("database_pools", ()))
+        # The cache's hit, miss, store and eviction counts only grow; its sizes are gauges
+        return metrics.metrics_response(
+            [
+                (f"llm_cache_{stat}_total", "counter", f"LLM result cache {stat.replace('_', ' ')} since start.", value)
+                for stat, value in sorted(cache_stats.items())
+                if stat in llm_cache.COUNTER_STATS
+            ]
+            + [
+                (f"llm_cache_{stat}", "gauge", f"LLM result cache {stat.replace('_', ' ')}.", value)
+                for stat, value in sorted(cache_stats.items())
+                if stat not in llm_cache.COUNTER_STATS
+            ]
+            + [(f"jobs_{status}", "gauge", f"Background jobs currently {status}.", count) for status, count in job_counts.items()]
+            + [("database_open_ledgers", "gauge", "Ledgers with an open connection pool in this process.", open_ledgers)]
+        )
 
     @app.route("/api/chat", methods=["POST"])
     def chat_with_llm():
@@ -61,26 +439,54 @@ def create_app():
         user_message = data.get("message")
         year = data.get("year")
         month = data.get("month")
+        session_id = data.get("session_id") or request.headers.get("X-Session-ID") or "default"
 
         if not user_message:
             return jsonify({"error": "No message provided"}), 400
 
+        if not isinstance(session_id, str) or len(session_id) > 128:
+            return jsonify({"error": "Invalid session_id"}), 400
+
         if not year or not month:
             return jsonify({"error": "Missing year/month context"}), 400
 
-        try:
-            month_str = str(month).rjust(2, '0')
-            budget_context = database.get_budget(year, month)
-            costs_context = database.get_all_costs(str(year), month_str)
+        # Keep conversations of different ledgers apart even when clients reuse session ids
+        if database.current_ledger() != database.DEFAULT_LEDGER:
+            session_id = f"{database.current_ledger()}/{session_id}"
+
+        stream = data.get("stream") or request.accept_mimetypes.best == "text/event-stream"
 
+        # Plain "coffee 4.50"-style messages are answered locally without a model call
+        if app.config["CHAT_FAST_PATH"]:
+            fast_response = fastpath.try_fast_path(
+                user_message,
+                session_id,
+                min_confidence=app.config["CHAT_FAST_PATH_MIN_CONFIDENCE"],
+                min_count=app.config["CHAT_FAST_PATH_MIN_COUNT"],
+            )
+            if fast_response:
+                if stream:
+                    return _sse_response([("pending_actions", fast_response), ("done", {"reply": fast_response["reply"]})])
+                return jsonify(fast_response)
+
+        llm = _get_llm()
+
+        try:
             financial_context = {
                 "year": year,
                 "month": month,
-                "budget": budget_context,
-                "costs": costs_context
+                **database.get_month_context(
+                    year,
+                    month,
+                    token_budget=app.config["CHAT_CONTEXT_TOKEN_BUDGET"],
+                    top_n=app.config["CHAT_CONTEXT_TOP_N"],
+                ),
             }
 
-            llm_response = llm.get_chat_response(user_message, financial_context)
+            if stream:
+                return _sse_response(llm.stream_chat_response(user_message, financial_context, session_id=session_id))
+
+            llm_response = llm.get_chat_response(user_message, financial_context, session_id=session_id)
 
             return jsonify(llm_response)
 
@@ -90,6 +496,7 @@ def create_app():
 
 
     @app.route("/api/costs/budget/<int:year>/<int:month>", methods=["GET"])
+    @_versioned(lambda year, month: database.month_scope(year, month))
     def get_budget(year, month):
         budget = database.get_budget(year, month)
         if budget:
@@ -108,16 +515,46 @@ def create_app():
         return jsonify({"success": True}), 200
 
     @app.route("/api/budgets/history", methods=["GET"])
+    @_versioned(_global_scope)
     def get_budgets_history():
         history = database.get_all_budgets_history()
         return jsonify(history)
 
     @app.route("/api/costs/history", methods=["GET"])
+    @_versioned(_global_scope)
     def get_costs_history():
-        history = database.get_costs_history()
-        return jsonify(history)
+        return _stream_json(database.iter_costs_history())
+
+    @app.route("/api/analytics", methods=["GET"])
+    def get_analytics():
+        try:
+            # NumPy is only loaded by the first analytics request
+            from . import analytics
+        except ImportError as e:
+            print(f"Analytics Unavailable: {e}")
+            return jsonify({"error": "Analytics are not available on this server."}), 503
+
+        window = request.args.get("window", 3, type=int)
+        if not 1 <= window <= 24:
+            return jsonify({"error": "window must be between 1 and 24"}), 400
+
+        # The projection is for the given month as of today: partial for the
+        # current month, the actual spend for past ones, none for future ones
+        today = date.today()
+        year = request.args.get("year", today.year, type=int)
+        month = request.args.get("month", today.month, type=int)
+        if not 1 <= month <= 12:
+            return jsonify({"error": "Invalid month"}), 400
+        if (year, month) == (today.year, today.month):
+            day = today.day
+        elif (year, month) < (today.year, today.month):
+            day = calendar.monthrange(year, month)[1]
+        else:
+            day = None
+        return jsonify(analytics.get_analytics(window=window, year=year, month=month, day=day))
 
     @app.route("/api/costs/summary")
+    @_versioned(_global_scope)
     def get_costs_summary():
         return jsonify(database.get_summary_of_months())
 
@@ -126,7 +563,43 @@ def create_app():
         year, month = request.args.get("year"), request.args.get("month")
         if not all([year, month]):
             return jsonify({"error": "Missing year/month parameters"}), 400
-        return jsonify(database.get_all_previous_costs(year, month))
+        cost_type = request.args.get("cost_type")
+        if cost_type and cost_type not in ["fixed", "variable"]:
+            return jsonify({"error": "Invalid cost type"}), 400
+        limit = request.args.get("limit", 100, type=int)
+        if not 1 <= limit <= 500:
+            return jsonify({"error": "limit must be between 1 and 500"}), 400
+        try:
+            costs, next_cursor = database.get_all_previous_costs(
+                year,
+                month,
+                limit=limit,
+                cursor=request.args.get("cursor"),
+                cost_type=cost_type,
+                name_prefix=request.args.get("name_prefix"),
+                start_date=request.args.get("start_date"),
+                end_date=request.args.get("end_date"),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # The body stays a plain list; the next page is advertised in a header
+        response = _stream_json(costs)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    @app.route("/api/costs/search")
+    @_versioned(_global_scope, validate=_search_error)
+    def search_costs():
+        try:
+            costs, next_cursor = database.search_costs(**_search_args())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # Paged like /api/costs/all_previous: a plain list, the next page in a header
+        response = jsonify(costs)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
 
     @app.route("/api/costs/batch_add", methods=["POST"])
     def batch_add():
@@ -138,10 +611,119 @@ def create_app():
         database.batch_add_costs(costs)
         return jsonify({"success": True}), 201
 
+    @app.route("/api/export", methods=["GET"])
+    def export_ledger():
+        try:
+            last_id, chunks = database.export_ledger(
+                since_id=request.args.get("since_id", 0, type=int),
+                since=request.args.get("since"),
+                compression=request.args.get("compression", "zlib"),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # stream_with_context keeps the connection, and its read snapshot, until the last block
+        response = Response(stream_with_context(chunks), mimetype="application/octet-stream")
+        response.headers["Content-Disposition"] = f'attachment; filename="{database.current_ledger()}.stcol"'
+        response.headers["X-Export-Last-Id"] = str(last_id)
+        return response
+
+    @app.route("/api/restore", methods=["POST"])
+    def restore_ledger():
+        # Either a multipart upload or the export as the raw request body
+        export_file = request.files.get("export_file")
+        try:
+            loaded = database.restore_ledger(export_file.stream if export_file else request.stream)
+        except columnar.FormatError as e:
+            return jsonify({"error": str(e)}), 400
+        except sqlite3.IntegrityError as e:
+            return jsonify({"error": f"The export conflicts with this ledger: {e}"}), 409
+        return jsonify(loaded)
+
+    @app.route("/api/costs/copy_forward", methods=["POST"])
+    def copy_forward():
+        data = request.get_json(silent=True) or {}
+        source = data.get("source")
+        try:
+            if source != database.TEMPLATE_SOURCE:
+                database.parse_period(source)
+            first = database.parse_period(data.get("target"))
+            last = database.parse_period(data["through"]) if data.get("through") else None
+            result = database.copy_recurring_costs(source, first, last)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result), 201 if result["copied"] else 200
+
+    @app.route("/api/costs/recurring", methods=["GET"])
+    def get_recurring_costs():
+        return jsonify(database.get_recurring_costs())
+
+    @app.route("/api/costs/recurring", methods=["PUT"])
+    def set_recurring_costs():
+        data = request.get_json(silent=True)
+        # Either the set itself, or {"year", "month"} to save that month's fixed costs as the set
+        if isinstance(data, dict) and data.get("year") and data.get("month"):
+            saved = database.set_recurring_costs_from_month(data["year"], data["month"])
+            return jsonify({"saved": saved})
+        if not isinstance(data, list):
+            return jsonify({"error": "Request body must be a list or a year and month"}), 400
+        costs = []
+        for cost in data:
+            cost = {"description": None, "type": "fixed", "day": 1, **cost}
+            if not cost.get("name") or cost.get("amount") is None:
+                return jsonify({"error": "Each recurring cost needs a name and an amount"}), 400
+            if cost["type"] not in ["fixed", "variable"]:
+                return jsonify({"error": "Invalid type specified"}), 400
+            if not isinstance(cost["day"], int) or not 1 <= cost["day"] <= 31:
+                return jsonify({"error": "day must be between 1 and 31"}), 400
+            costs.append(cost)
+        database.set_recurring_costs(costs)
+        return jsonify({"saved": len(costs)})
+
+    @app.route("/api/costs/import", methods=["POST"])
+    def import_statement():
+        if 'statement_file' not in request.files:
+            return jsonify({"error": "No file provided"}), 400
+
+        statement_file = request.files['statement_file']
+
+        if statement_file.filename == '':
+            return jsonify({"error": "No selected file"}), 400
+
+        columns = {
+            field: request.form[f"{field}_column"]
+            for field in importer.COLUMN_ALIASES
+            if request.form.get(f"{field}_column")
+        }
+        try:
+            fmt = request.form.get("format") or importer.detect_format(statement_file.filename)
+            # The upload is read line by line from Werkzeug's spooled file
+            result = database.import_statement(
+                statement_file.stream,
+                fmt,
+                expense_sign=request.form.get("expense_sign", "negative"),
+                default_type=request.form.get("default_type", "variable"),
+                date_format=request.form.get("date_format"),
+                columns=columns,
+            )
+        except importer.StatementError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result), 201
+
+    @app.route("/api/costs/bulk", methods=["POST"])
+    def bulk_costs():
+        operations = request.get_json()
+        if not isinstance(operations, list):
+            return jsonify({"error": "Request body must be a list"}), 400
+        if len(operations) > app.config["BULK_MAX_OPERATIONS"]:
+            return jsonify({"error": f"At most {app.config['BULK_MAX_OPERATIONS']} operations per request"}), 400
+        results = database.apply_bulk_operations(operations)
+        return jsonify({"results": results}), 200
+
     @app.route("/api/costs", methods=["GET"])
+    @_versioned(_request_month_scope)
     def get_costs():
         year, month = request.args.get("year"), request.args.get("month")
-        return jsonify(database.get_all_costs(year=year, month=month))
+        return _stream_json(database.iter_all_costs(year=year, month=month))
 
     @app.route("/api/costs", methods=["POST"])
     def add_new_cost():
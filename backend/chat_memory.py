@@ -0,0 +1,130 @@
+# backend/chat_memory.py
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from flask import current_app, has_app_context
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_turns (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  session_id TEXT NOT NULL,
+  input TEXT NOT NULL,
+  output TEXT NOT NULL,
+  created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_turns_session ON chat_turns (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_chat_turns_created_at ON chat_turns (created_at);
+"""
+
+
+class SessionMemoryStore:
+    """
+    Keeps the last `window` chat turns (user input, assistant output) per session.
+
+    Without a path the turns live in an in-process LRU of at most max_sessions
+    sessions, and sessions idle for longer than idle_ttl seconds are dropped.
+    With a path they are stored in SQLite instead, so history survives restarts
+    and is shared by every worker process.
+    """
+
+    def __init__(self, window=4, max_sessions=1000, idle_ttl=3600, path=None):
+        self.window = window
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.path = path
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_prune = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _prune_memory(self, now):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session["touched"] < self.idle_ttl:
+                break
+            del self._sessions[session_id]
+
+    def load(self, session_id):
+        """Returns the session's turns as a list of (input, output) tuples, oldest first."""
+        now = time.time()
+        if self.path:
+            rows = self._connection().execute(
+                "SELECT input, output FROM chat_turns WHERE session_id = ? AND created_at >= ? ORDER BY id DESC LIMIT ?",
+                (session_id, now - self.idle_ttl, self.window),
+            ).fetchall()
+            return list(reversed(rows))
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or now - session["touched"] >= self.idle_ttl:
+                return []
+            return list(session["turns"])
+
+    def save(self, session_id, user_input, output):
+        now = time.time()
+        if self.path:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO chat_turns (session_id, input, output, created_at) VALUES (?, ?, ?, ?)",
+                    (session_id, user_input, output, now),
+                )
+                conn.execute(
+                    "DELETE FROM chat_turns WHERE session_id = ? AND id NOT IN "
+                    "(SELECT id FROM chat_turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, self.window),
+                )
+                # Idle sessions are swept at most once a minute
+                if now - self._last_prune > 60:
+                    self._last_prune = now
+                    conn.execute("DELETE FROM chat_turns WHERE created_at < ?", (now - self.idle_ttl,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or now - session["touched"] >= self.idle_ttl:
+                session = {"turns": deque(maxlen=self.window), "touched": now}
+                self._sessions[session_id] = session
+            session["turns"].append((user_input, output))
+            session["touched"] = now
+            self._sessions.move_to_end(session_id)
+            self._prune_memory(now)
+
+    def clear(self, session_id):
+        if self.path:
+            self._connection().execute("DELETE FROM chat_turns WHERE session_id = ?", (session_id,))
+            return
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+_store = SessionMemoryStore()
+
+
+def get_store():
+    return current_app.extensions["chat_memory"] if has_app_context() else _store
+
+
+def init_app(app):
+    global _store
+    _store = app.extensions["chat_memory"] = SessionMemoryStore(
+        window=app.config.get("CHAT_MEMORY_WINDOW", 4),
+        max_sessions=app.config.get("CHAT_MEMORY_MAX_SESSIONS", 1000),
+        idle_ttl=app.config.get("CHAT_MEMORY_IDLE_TTL", 3600),
+        path=app.config.get("CHAT_MEMORY_PATH"),
+    )
@@ -1,56 +1,482 @@
 # backend/database.py
+import base64
+import functools
+import itertools
+import json
+import os
+import queue
+import re
 import sqlite3
+import threading
+from collections import OrderedDict
 import click
-from flask import current_app, g
+from flask import current_app, g, request
+from . import columnar
+from . import importer
+from . import metrics
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the configured timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections shared by the worker threads of one process.
+    Connections are tuned once when they are opened and checked with a trivial
+    query before being handed out again, so a broken handle is replaced instead
+    of failing a request.
+    """
+
+    def __init__(self, path, size=8, timeout=5.0, busy_timeout_ms=5000, cache_size_kb=16384, mmap_size=268435456):
+        self.path = path
+        self.timeout = timeout
+        self._pragmas = [
+            "PRAGMA journal_mode = WAL",
+            "PRAGMA synchronous = NORMAL",
+            f"PRAGMA busy_timeout = {int(busy_timeout_ms)}",
+            f"PRAGMA cache_size = -{int(cache_size_kb)}",
+            f"PRAGMA mmap_size = {int(mmap_size)}",
+        ]
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _connect(self):
+        # Each connection is only ever used by one thread at a time, but not
+        # always by the thread that opened it.
+        conn = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            factory=metrics.InstrumentedConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in self._pragmas:
+            conn.execute(pragma)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection became available within {self.timeout}s")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._is_healthy(conn):
+                    return conn
+                conn.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if self._closed:
+                conn.close()
+                return
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Closes the idle connections; connections still checked out are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+DEFAULT_LEDGER = "default"
+LEDGER_HEADER = "X-Ledger"
+_LEDGER_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+class InvalidLedger(ValueError):
+    """Raised for a ledger name that is malformed or cannot be served."""
+
+
+class LedgerPools:
+    """
+    The connection pools of the ledgers one process has open, most recently
+    used last. Beyond max_open ledgers the least recently used pool is closed,
+    so thousands of ledgers never mean thousands of open files; its
+    checked-out connections are closed as they are released.
+    """
+
+    def __init__(self, max_open=64):
+        self.max_open = max_open
+        self.lock = threading.Lock()
+        self._pools = OrderedDict()
+
+    def get(self, path, create):
+        """Returns the pool for path, calling create(path) under the lock when it is not open."""
+        with self.lock:
+            pool = self._pools.get(path)
+            if pool is not None:
+                self._pools.move_to_end(path)
+                return pool
+            pool = self._pools[path] = create(path)
+            while len(self._pools) > self.max_open:
+                self._pools.popitem(last=False)[1].close()
+            return pool
+
+    def __len__(self):
+        return len(self._pools)
+
+    def close(self):
+        with self.lock:
+            while self._pools:
+                self._pools.popitem()[1].close()
+
+
+def validate_ledger(name):
+    if not isinstance(name, str) or not _LEDGER_NAME.match(name):
+        raise InvalidLedger("Ledger names are 1-64 letters, digits, '-' or '_'")
+    return name
+
+
+def current_ledger():
+    return g.get("ledger") or DEFAULT_LEDGER
+
+
+def ledger_path(ledger=None):
+    """The SQLite file of a ledger; the default ledger is the DATABASE file, the others live in LEDGERS_DIR."""
+    ledger = ledger or current_ledger()
+    if ledger == DEFAULT_LEDGER:
+        return current_app.config["DATABASE"]
+    ledgers_dir = current_app.config.get("LEDGERS_DIR")
+    if not ledgers_dir:
+        raise InvalidLedger("This server keeps a single ledger")
+    return os.path.join(ledgers_dir, f"{ledger}.sqlite")
+
+
+def _prepare_ledger(path):
+    """
+    Creates a ledger file with the full schema on first use, or migrates an
+    existing one. A new file is built under a temporary name and linked into
+    place, so another worker never sees it half initialized.
+    """
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        conn = sqlite3.connect(tmp_path)
+        try:
+            init_db(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass  # Another worker created it first
+        finally:
+            os.remove(tmp_path)
+        return
+    conn = sqlite3.connect(path, timeout=current_app.config.get("DB_BUSY_TIMEOUT_MS", 5000) / 1000)
+    try:
+        migrate_db(conn)
+    finally:
+        conn.close()
+
+
+def _get_pool():
+    # Created on first use rather than in create_app so that forked
+    # server workers each open their own connections.
+    pools = current_app.extensions.setdefault(
+        "database_pools", LedgerPools(current_app.config.get("DB_MAX_OPEN_LEDGERS", 64))
+    )
+    ledger = current_ledger()
+    config = current_app.config
+
+    def create(path):
+        # The default ledger is initialized and migrated explicitly (flask init-db / migrate-db)
+        if ledger != DEFAULT_LEDGER:
+            _prepare_ledger(path)
+        return ConnectionPool(
+            path,
+            size=config.get("DB_POOL_SIZE", 8),
+            timeout=config.get("DB_POOL_TIMEOUT", 5.0),
+            busy_timeout_ms=config.get("DB_BUSY_TIMEOUT_MS", 5000),
+            cache_size_kb=config.get("DB_CACHE_SIZE_KB", 16384),
+            mmap_size=config.get("DB_MMAP_SIZE", 268435456),
+        )
+
+    return pools.get(ledger_path(ledger), create)
 
 
 def get_db():
     if "db" not in g:
-        g.db = sqlite3.connect(
-            current_app.config["DATABASE"], detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        g.db_pool = _get_pool()
+        g.db = g.db_pool.acquire()
     return g.db
 
 
 def close_db(e=None):
     db = g.pop("db", None)
+    pool = g.pop("db_pool", None)
     if db is not None:
-        db.close()
+        pool.release(db)
 
 
-def init_db():
-    db = get_db()
+def _migration_files():
+    """Returns the migration scripts in the order they must be applied."""
+    migrations_dir = os.path.join(current_app.root_path, "migrations")
+    return sorted(f for f in os.listdir(migrations_dir) if f.endswith(".sql"))
+
+
+def init_db(db=None):
+    db = db or get_db()
     with current_app.open_resource("schema.sql") as f:
         db.executescript(f.read().decode("utf8"))
+    # schema.sql already reflects every migration
+    db.execute(f"PRAGMA user_version = {len(_migration_files())}")
+
+
+def migrate_db(db=None):
+    """
+    Applies the scripts in migrations/ that a database has not seen yet.
+    PRAGMA user_version records how many have been applied.
+    Returns the names of the scripts that were run.
+    """
+    db = db or get_db()
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    applied = []
+    for number, filename in enumerate(_migration_files(), start=1):
+        if number <= version:
+            continue
+        with current_app.open_resource(os.path.join("migrations", filename)) as f:
+            script = f.read().decode("utf8")
+        # One transaction per script, version bump included, so a failed script leaves nothing behind
+        try:
+            db.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+        except sqlite3.Error:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        applied.append(filename)
+    return applied
+
+
+def _ledger_option(command):
+    """Adds --ledger to a CLI command, selecting the ledger file it works on."""
+    @click.option("--ledger", default=DEFAULT_LEDGER, show_default=True, help="The ledger to work on.")
+    @functools.wraps(command)
+    def wrapper(*args, ledger, **kwargs):
+        try:
+            g.ledger = validate_ledger(ledger)
+        except InvalidLedger as e:
+            raise click.BadParameter(str(e), param_hint="--ledger")
+        return command(*args, **kwargs)
+    return wrapper
 
 
 @click.command("init-db")
+@_ledger_option
 def init_db_command():
     init_db()
     click.echo("Initialized the database.")
 
 
+@click.command("migrate-db")
+@_ledger_option
+def migrate_db_command():
+    applied = migrate_db()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(applied)}")
+    else:
+        click.echo("The database is up to date.")
+
+
+_REBUILD_MONTHLY_TOTALS = """
+    INSERT INTO monthly_totals (year, month, cost_type, total, count)
+    SELECT substr(period, 1, 4), substr(period, 6, 2), cost_type, SUM(amount), COUNT(*)
+    FROM costs
+    WHERE period IS NOT NULL
+    GROUP BY period, cost_type
+"""
+
+
+def rebuild_monthly_totals():
+    """Recomputes the monthly_totals rollup from scratch, e.g. after editing the file by hand."""
+    db = get_db()
+    db.execute("DELETE FROM monthly_totals")
+    db.execute(_REBUILD_MONTHLY_TOTALS)
+    db.commit()
+
+
+@click.command("rebuild-totals")
+@_ledger_option
+def rebuild_totals_command():
+    rebuild_monthly_totals()
+    click.echo("Rebuilt the monthly totals.")
+
+
+@click.command("import-statement")
+@_ledger_option
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(importer.FORMATS), help="Defaults to the file extension.")
+@click.option("--expense-sign", type=click.Choice(importer.EXPENSE_SIGNS), default="negative", show_default=True,
+              help="Which amounts are expenses; 'any' imports the absolute value of every row.")
+@click.option("--default-type", type=click.Choice(["fixed", "variable"]), default="variable", show_default=True)
+@click.option("--date-format", help="strptime format, e.g. %d/%m/%Y, when the dates are ambiguous.")
+@click.option("--name-column")
+@click.option("--amount-column")
+@click.option("--date-column")
+@click.option("--type-column")
+@click.option("--description-column")
+def import_statement_command(path, fmt, expense_sign, default_type, date_format, **columns):
+    columns = {k[: -len("_column")]: v for k, v in columns.items() if v}
+    try:
+        with open(path, "rb") as f:
+            result = import_statement(
+                f, fmt or importer.detect_format(path),
+                expense_sign=expense_sign, default_type=default_type, date_format=date_format, columns=columns,
+            )
+    except importer.StatementError as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        f"Imported {result['imported']} costs, skipped {result['duplicates']} duplicates, "
+        f"{result['not_expenses']} non-expense and {result['invalid']} unreadable rows."
+    )
+
+
+@click.command("copy-forward")
+@_ledger_option
+@click.argument("first")
+@click.argument("last", required=False)
+@click.option("--from", "source", required=True, help="The YYYY-MM month whose fixed costs are copied, or 'template' for the saved recurring set.")
+def copy_forward_command(first, last, source):
+    """Copies recurring costs into the months FIRST through LAST (YYYY-MM)."""
+    try:
+        if source != TEMPLATE_SOURCE:
+            parse_period(source)
+        result = copy_recurring_costs(source, parse_period(first), parse_period(last) if last else None)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Copied {result['copied']} costs into {result['months']} months.")
+
+
+def _select_ledger():
+    ledger = request.headers.get(LEDGER_HEADER) or request.args.get("ledger")
+    if ledger:
+        g.ledger = validate_ledger(ledger)
+
+
+@click.command("export-ledger")
+@_ledger_option
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--since-id", type=int, default=0, help="Only costs with a higher id, e.g. the last_id of the previous export.")
+@click.option("--since", help="Only costs dated from this ISO date or timestamp on.")
+@click.option("--compression", type=click.Choice(columnar.COMPRESSIONS), default="zlib", show_default=True)
+def export_ledger_command(path, since_id, since, compression):
+    try:
+        last_id, chunks = export_ledger(since_id=since_id, since=since, compression=compression)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    click.echo(f"Exported costs up to id {last_id} to {path}.")
+
+
+@click.command("restore-ledger")
+@_ledger_option
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def restore_ledger_command(path):
+    try:
+        with open(path, "rb") as f:
+            loaded = restore_ledger(f)
+    except (columnar.FormatError, sqlite3.IntegrityError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restored {loaded['costs']} costs and {loaded['budgets']} budgets.")
+
+
 def init_app(app):
+    app.before_request(_select_ledger)
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
+    app.cli.add_command(rebuild_totals_command)
+    app.cli.add_command(import_statement_command)
+    app.cli.add_command(copy_forward_command)
+    app.cli.add_command(export_ledger_command)
+    app.cli.add_command(restore_ledger_command)
 
 
-def get_all_costs(year=None, month=None):
+class InvalidMonth(ValueError):
+    """Raised for a year/month request value that is not a calendar month."""
+
+
+class InvalidDate(ValueError):
+    """Raised for a cost date that SQLite's date functions cannot read."""
+
+
+def _check_date(value):
+    if not isinstance(value, str) or not _BULK_DATE_PATTERN.match(value):
+        raise InvalidDate(f"Invalid date: {value!r}; use an ISO date such as 2024-05-01 or 2024-05-01T12:00:00")
+
+
+def _period(year, month):
+    """Formats year/month request values as the YYYY-MM key stored in costs.period."""
+    try:
+        year, month = int(year), int(month)
+    except (TypeError, ValueError):
+        raise InvalidMonth(f"Invalid year/month: {year!r}/{month!r}") from None
+    if not 1 <= year <= 9999 or not 1 <= month <= 12:
+        raise InvalidMonth(f"Invalid year/month: {year}/{month}")
+    return f"{year:04d}-{month:02d}"
+
+
+def _iter_dicts(cursor, batch_size=500):
+    """Yields the rows of an executed cursor as dicts, fetching them in batches."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row)
+
+
+def iter_all_costs(year=None, month=None):
+    """
+    Like get_all_costs, but yields the rows lazily.
+    The query runs immediately; the rows are fetched as the caller consumes them.
+    """
     query = "SELECT id, name, amount, description, cost_type, is_checked, strftime('%Y-%m-%dT%H:%M:%SZ', created_at) AS created_at FROM costs"
     conditions, params = [], []
     if year and month:
-        conditions.append("strftime('%Y', created_at) = ?")
-        params.append(year)
-        conditions.append("strftime('%m', created_at) = ?")
-        params.append(month)
+        conditions.append("period = ?")
+        params.append(_period(year, month))
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
-    query += " ORDER BY is_checked ASC, created_at DESC"
-    return [dict(row) for row in get_db().execute(query, params).fetchall()]
+    # Qualified, because a bare created_at in ORDER BY means the formatted output column
+    query += " ORDER BY is_checked ASC, costs.created_at DESC"
+    return _iter_dicts(get_db().execute(query, params))
+
+
+def get_all_costs(year=None, month=None):
+    return list(iter_all_costs(year, month))
 
 
 def add_cost(name, amount, description, cost_type, date_str):
+    _check_date(date_str)
     db = get_db()
     db.execute(
         "INSERT INTO costs (name, amount, description, cost_type, created_at) VALUES (?, ?, ?, ?, ?)",
@@ -60,16 +486,159 @@ def add_cost(name, amount, description, cost_type, date_str):
 
 
 def get_summary_of_months():
-    query = "SELECT DISTINCT strftime('%Y', created_at) as year, strftime('%m', created_at) as month FROM costs ORDER BY year, month"
+    query = "SELECT DISTINCT year, month FROM monthly_totals ORDER BY year, month"
     return [dict(row) for row in get_db().execute(query).fetchall()]
 
 
-def get_all_previous_costs(year, month):
-    query = "SELECT id, name, amount, description, cost_type, strftime('%Y-%m-%dT%H:%M:%SZ', created_at) AS created_at FROM costs WHERE NOT (strftime('%Y', created_at) = ? AND strftime('%m', created_at) = ?) ORDER BY created_at DESC;"
-    return [dict(row) for row in get_db().execute(query, (year, month)).fetchall()]
+GLOBAL_SCOPE = "*"
+
+
+def month_scope(year, month):
+    """The data_versions scope that covers one month of costs and its budget."""
+    return _period(year, month)
+
+
+def get_data_version(scope=GLOBAL_SCOPE):
+    """
+    Returns the current version of a scope. Triggers bump it on every write,
+    so an unchanged version means unchanged data.
+    """
+    row = get_db().execute("SELECT version FROM data_versions WHERE scope = ?", (scope,)).fetchone()
+    return row["version"] if row else 0
+
+
+def _encode_cursor(created_at, cost_id):
+    return base64.urlsafe_b64encode(f"{created_at}|{cost_id}".encode("utf8")).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, cost_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf8").rsplit("|", 1)
+        return created_at, int(cost_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def get_all_previous_costs(year, month, limit=100, cursor=None, cost_type=None, name_prefix=None, start_date=None, end_date=None):
+    """
+    Returns one page of costs outside the given month, newest first, and the
+    cursor for the next page (None on the last page).
+    Pages are keyed on (created_at, id) so each one is an index range scan
+    no matter how deep into the history it is.
+    """
+    period = _period(year, month)
+    conditions, params = ["(period < ? OR period > ?)"], [period, period]
+    if cursor:
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+    if cost_type:
+        conditions.append("cost_type = ?")
+        params.append(cost_type)
+    if name_prefix:
+        escaped = name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("name LIKE ? ESCAPE '\\'")
+        params.append(escaped + "%")
+    if start_date:
+        conditions.append("created_at >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("created_at < date(?, '+1 day')")
+        params.append(end_date)
+
+    # CAST keeps PARSE_DECLTYPES from converting the raw timestamp used for the cursor
+    query = (
+        "SELECT id, name, amount, description, cost_type, strftime('%Y-%m-%dT%H:%M:%SZ', created_at) AS created_at, "
+        "CAST(created_at AS TEXT) AS sort_key FROM costs WHERE " + " AND ".join(conditions)
+        + " ORDER BY costs.created_at DESC, id DESC LIMIT ?"
+    )
+    params.append(limit + 1)
+    rows = get_db().execute(query, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["sort_key"], rows[-1]["id"])
+    costs = []
+    for row in rows:
+        cost = dict(row)
+        del cost["sort_key"]
+        costs.append(cost)
+    return costs, next_cursor
+
+
+_SEARCH_TERM = re.compile(r"\w+\*?")
+SEARCH_SORTS = ("rank", "date")
+
+
+def build_search_query(text, prefix_last=True):
+    """
+    Turns free text into an FTS5 query: every word must match, a word ending
+    in * matches as a prefix, and so does the last word when prefix_last is
+    set (search-as-you-type). Quoting each word keeps FTS5 operators and
+    punctuation in user input from being parsed as query syntax.
+    Returns None when the text has no searchable words.
+    """
+    terms = _SEARCH_TERM.findall(text or "")
+    if not terms:
+        return None
+    parts = []
+    for i, term in enumerate(terms):
+        is_prefix = term.endswith("*") or (prefix_last and i == len(terms) - 1)
+        parts.append(f'"{term.rstrip("*")}"' + ("*" if is_prefix else ""))
+    return " ".join(parts)
+
+
+def search_costs(text, limit=50, cursor=None, sort="rank", cost_type=None, start_date=None, end_date=None, prefix_last=True):
+    """
+    Full-text search over cost names and descriptions, with matches in the
+    name weighted above matches in the description. Returns one page of costs
+    ordered by relevance (or newest first with sort="date") and the cursor for
+    the next page, None on the last one.
+    """
+    match = build_search_query(text, prefix_last)
+    if match is None:
+        return [], None
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+
+    conditions, params = ["costs_fts MATCH ?"], [match]
+    if cost_type:
+        conditions.append("c.cost_type = ?")
+        params.append(cost_type)
+    if start_date:
+        conditions.append("c.created_at >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("c.created_at < date(?, '+1 day')")
+        params.append(end_date)
+    order = "score, c.id DESC" if sort == "rank" else "c.created_at DESC, c.id DESC"
+
+    query = (
+        "SELECT c.id, c.name, c.amount, c.description, c.cost_type, c.is_checked, "
+        "strftime('%Y-%m-%dT%H:%M:%SZ', c.created_at) AS created_at, bm25(costs_fts, 10.0, 1.0) AS score "
+        "FROM costs_fts JOIN costs c ON c.id = costs_fts.rowid WHERE " + " AND ".join(conditions)
+        + f" ORDER BY {order} LIMIT ? OFFSET ?"
+    )
+    params.extend([limit + 1, offset])
+    rows = [dict(row) for row in get_db().execute(query, params).fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(offset + limit)
+    for row in rows:
+        # bm25 is lower for better matches; expose it as a positive relevance
+        row["score"] = round(-row["score"], 4)
+    return rows, next_cursor
 
 
 def batch_add_costs(costs):
+    for cost in costs:
+        _check_date(cost.get("date"))
     db = get_db()
     db.executemany(
         "INSERT INTO costs (name, amount, description, cost_type, created_at) VALUES (:name, :amount, :description, :type, :date)",
@@ -78,6 +647,303 @@ def batch_add_costs(costs):
     db.commit()
 
 
+def _fingerprint_rows(db, chunk):
+    """
+    Fingerprints the rows of a chunk that have only a row_key. The count of
+    identical rows seen so far comes from a temp table rather than memory,
+    so a statement of any length is numbered in one chunk's memory.
+    """
+    keys = [cost["row_key"] for cost in chunk if cost["fingerprint"] is None]
+    if not keys:
+        return
+    seen = dict(db.execute(
+        "SELECT key, seen FROM temp.import_occurrences WHERE key IN (SELECT value FROM json_each(?))", (json.dumps(keys),)
+    ))
+    for cost in chunk:
+        if cost["fingerprint"] is None:
+            occurrence = seen.get(cost["row_key"], 0)
+            seen[cost["row_key"]] = occurrence + 1
+            cost["fingerprint"] = importer.row_fingerprint(cost["row_key"], occurrence)
+    db.executemany(
+        "INSERT INTO temp.import_occurrences (key, seen) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET seen = excluded.seen",
+        seen.items(),
+    )
+
+
+def import_costs(costs, chunk_size=1000):
+    """
+    Inserts an iterable of costs from importer.parse_statement in chunks of
+    executemany; the unique fingerprint index skips rows already stored.
+    Only one chunk is held in memory at a time; everything commits together.
+    Returns (inserted, duplicates).
+    """
+    db = get_db()
+    inserted = duplicates = 0
+    costs = iter(costs)
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS import_occurrences (key TEXT PRIMARY KEY, seen INTEGER NOT NULL)")
+    try:
+        with db:
+            db.execute("DELETE FROM temp.import_occurrences")
+            while True:
+                chunk = list(itertools.islice(costs, chunk_size))
+                if not chunk:
+                    break
+                _fingerprint_rows(db, chunk)
+                # rowcount counts the rows this statement inserted, not the trigger writes
+                added = db.executemany(
+                    "INSERT INTO costs (name, amount, description, cost_type, created_at, fingerprint) "
+                    "VALUES (:name, :amount, :description, :type, :date, :fingerprint) ON CONFLICT(fingerprint) DO NOTHING",
+                    chunk,
+                ).rowcount
+                inserted += added
+                duplicates += len(chunk) - added
+    finally:
+        db.execute("DROP TABLE temp.import_occurrences")
+    return inserted, duplicates
+
+
+def import_statement(stream, fmt, chunk_size=1000, **options):
+    """Parses a CSV/OFX/QIF statement stream and imports its expenses; returns a summary dict."""
+    stats = {}
+    inserted, duplicates = import_costs(importer.parse_statement(stream, fmt, stats, **options), chunk_size)
+    return {"imported": inserted, "duplicates": duplicates, **stats}
+
+
+# Costs as exported: created_at as the stored text, so a restore reproduces it exactly
+_EXPORT_COSTS = """
+    SELECT id, name, amount, description, cost_type, is_checked, CAST(created_at AS TEXT), fingerprint, recurrence_key
+    FROM costs
+    WHERE id > :since_id AND id <= :last_id
+"""
+_EXPORT_BUDGETS = "SELECT year, month, salary, savings_goal, fixed_percent, variable_percent FROM budgets ORDER BY year, month"
+
+
+def export_ledger(since_id=0, since=None, compression="zlib", block_rows=columnar.BLOCK_ROWS):
+    """
+    Exports costs, and all budgets, in the columnar format. since_id limits
+    the costs to ids above it, since (an ISO date or timestamp) to costs dated
+    from then on. Both tables are read from one snapshot.
+    Returns (last_id, chunks): the highest cost id covered, to pass as
+    since_id next time, and a generator of the encoded bytes, which must be
+    consumed in the same app context.
+    """
+    db = get_db()
+    since_seconds = None
+    if since:
+        since_seconds = db.execute("SELECT CAST(strftime('%s', ?) AS INTEGER)", (since,)).fetchone()[0]
+        if since_seconds is None:
+            raise ValueError(f"Cannot read {since!r} as a date or timestamp")
+    # A read transaction keeps the export consistent while it streams; release() ends it
+    # should the chunks not be consumed. An open transaction is joined instead.
+    owns_transaction = not db.in_transaction
+    if owns_transaction:
+        db.execute("BEGIN")
+    last_id = db.execute("SELECT coalesce(max(id), 0) FROM costs").fetchone()[0]
+    writer = columnar.ColumnarWriter(compression, {
+        "ledger": current_ledger(),
+        "schema_version": db.execute("PRAGMA user_version").fetchone()[0],
+        "since_id": since_id,
+        "since": since,
+        "last_id": last_id,
+    })
+
+    def chunks():
+        try:
+            yield writer.header()
+            query = _EXPORT_COSTS
+            if since_seconds is not None:
+                # Costs whose date cannot be read are always included rather than lost
+                query += " AND coalesce(CAST(strftime('%s', created_at) AS INTEGER) >= :since, 1)"
+            for table, sql, params in (
+                ("costs", query + " ORDER BY id", {"since_id": since_id, "last_id": last_id, "since": since_seconds}),
+                ("budgets", _EXPORT_BUDGETS, ()),
+            ):
+                cursor = db.cursor()
+                cursor.row_factory = None
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(block_rows)
+                    if not rows:
+                        break
+                    yield writer.block(table, rows)
+            yield writer.trailer()
+        finally:
+            if owns_transaction and db.in_transaction:
+                db.rollback()
+
+    return last_id, chunks()
+
+
+_RESTORE_COSTS = """
+    INSERT INTO costs (id, name, amount, description, cost_type, is_checked, created_at, fingerprint, recurrence_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+      name = excluded.name, amount = excluded.amount, description = excluded.description,
+      cost_type = excluded.cost_type, is_checked = excluded.is_checked, created_at = excluded.created_at,
+      fingerprint = excluded.fingerprint, recurrence_key = excluded.recurrence_key
+"""
+_RESTORE_BUDGETS = """
+    INSERT INTO budgets (year, month, salary, savings_goal, fixed_percent, variable_percent) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(year, month) DO UPDATE SET salary = excluded.salary, savings_goal = excluded.savings_goal,
+      fixed_percent = excluded.fixed_percent, variable_percent = excluded.variable_percent
+"""
+
+
+def _rebuild_cost_rollups(db):
+    """Recomputes everything the costs triggers maintain, for a load that ran without them."""
+    db.execute("DELETE FROM monthly_totals")
+    db.execute(_REBUILD_MONTHLY_TOTALS)
+    db.execute("DELETE FROM name_type_counts")
+    db.execute(
+        "INSERT INTO name_type_counts (name_key, cost_type, count) "
+        "SELECT lower(trim(name)), cost_type, COUNT(*) FROM costs GROUP BY lower(trim(name)), cost_type"
+    )
+    db.execute("INSERT INTO costs_fts (costs_fts) VALUES ('rebuild')")
+    db.execute(
+        "INSERT INTO data_versions (scope, version) SELECT DISTINCT period, 1 FROM costs WHERE period IS NOT NULL "
+        "UNION ALL SELECT ?, 1 ON CONFLICT(scope) DO UPDATE SET version = version + 1",
+        (GLOBAL_SCOPE,),
+    )
+
+
+def restore_ledger(stream):
+    """
+    Loads a columnar export into the current ledger in one transaction.
+    Costs are upserted by id and budgets by month, so an incremental export
+    applies cleanly on top of the one before it. Into an empty ledger the
+    costs are bulk-loaded: the costs triggers are dropped for the load and
+    what they maintain is rebuilt once at the end, which is several times
+    faster than updating the rollups and the search index row by row.
+    Returns the rows loaded per table.
+    """
+    reader = columnar.ColumnarReader(stream)
+    loaded = dict.fromkeys(columnar.TABLES, 0)
+    db = get_db()
+    with db:
+        db.execute("BEGIN IMMEDIATE")
+        bulk = db.execute("SELECT NOT EXISTS (SELECT 1 FROM costs)").fetchone()[0]
+        triggers = []
+        if bulk:
+            # DDL is transactional in SQLite, so a failed load also brings the triggers back
+            triggers = db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'costs'").fetchall()
+            for name, _ in triggers:
+                db.execute(f'DROP TRIGGER "{name}"')
+        for table, rows in reader:
+            db.executemany(_RESTORE_COSTS if table == "costs" else _RESTORE_BUDGETS, rows)
+            loaded[table] += len(rows)
+        if bulk:
+            _rebuild_cost_rollups(db)
+            for _, sql in triggers:
+                db.execute(sql)
+    return loaded
+
+
+TEMPLATE_SOURCE = "template"
+MAX_COPY_MONTHS = 120
+_PERIOD_PATTERN = re.compile(r"^(\d{4})-(\d{2})$")
+
+
+def parse_period(text):
+    """Parses a YYYY-MM string into the costs.period key, raising ValueError if it is not one."""
+    match = _PERIOD_PATTERN.match(text or "")
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"Expected a YYYY-MM month, got {text!r}")
+    return text
+
+
+def _months_between(first, last):
+    year, month = map(int, first.split("-"))
+    last_year, last_month = map(int, last.split("-"))
+    count = (last_year - year) * 12 + last_month - month + 1
+    if count < 1:
+        raise ValueError("The last month comes before the first")
+    if count > MAX_COPY_MONTHS:
+        raise ValueError(f"At most {MAX_COPY_MONTHS} months can be copied at once")
+    return count
+
+
+# The recurring rows to copy, as (name, amount, description, cost_type, day, time, recurrence_key).
+# A copy inherits its source's key, so copies of copies still count as the same cost.
+_MONTH_SOURCE = """
+    SELECT name, amount, description, cost_type, CAST(strftime('%d', created_at) AS INTEGER) AS day,
+           strftime('%H:%M:%S', created_at) AS time, coalesce(recurrence_key, 'cost:' || id) AS recurrence_key
+    FROM costs WHERE period = :source AND cost_type = 'fixed'
+"""
+_TEMPLATE_SOURCE = """
+    SELECT name, amount, description, cost_type, day, '12:00:00' AS time, 'template:' || id AS recurrence_key
+    FROM recurring_costs
+"""
+
+
+def copy_recurring_costs(source, first, last=None):
+    """
+    Copies recurring costs into every month from first to last (YYYY-MM,
+    inclusive) with one INSERT ... SELECT in one transaction. The source is a
+    month, whose fixed costs are copied, or TEMPLATE_SOURCE for the saved
+    recurring set. Each copy keeps its day of the month, clamped to the
+    target month's length. Re-running is safe: a month never receives the
+    same recurring cost twice, nor one whose name it already has as that type.
+    Returns {"copied": rows inserted, "months": months covered}.
+    """
+    last = last or first
+    months = _months_between(first, last)
+    source_rows = _TEMPLATE_SOURCE if source == TEMPLATE_SOURCE else _MONTH_SOURCE
+    db = get_db()
+    with db:
+        copied = db.execute(
+            f"""
+            INSERT INTO costs (name, amount, description, cost_type, created_at, recurrence_key)
+            WITH RECURSIVE months(period) AS (
+              SELECT :first
+              UNION ALL
+              SELECT strftime('%Y-%m', period || '-01', '+1 month') FROM months WHERE period < :last
+            ),
+            source AS ({source_rows})
+            SELECT s.name, s.amount, s.description, s.cost_type,
+                   date(m.period || '-01', printf('+%d days', min(s.day, CAST(strftime('%d', m.period || '-01', '+1 month', '-1 day') AS INTEGER)) - 1))
+                     || 'T' || s.time,
+                   s.recurrence_key
+            FROM months m CROSS JOIN source s
+            WHERE NOT EXISTS (
+              SELECT 1 FROM costs t
+              WHERE t.period = m.period AND t.cost_type = s.cost_type AND lower(trim(t.name)) = lower(trim(s.name))
+            )
+            ON CONFLICT DO NOTHING
+            """,
+            {"source": source, "first": first, "last": last},
+        ).rowcount
+    return {"copied": copied, "months": months}
+
+
+def get_recurring_costs():
+    query = "SELECT id, name, amount, description, cost_type, day FROM recurring_costs ORDER BY day, name"
+    return [dict(row) for row in get_db().execute(query).fetchall()]
+
+
+def set_recurring_costs(costs):
+    """Replaces the saved recurring set with a list of {name, amount, description, type, day} dicts."""
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM recurring_costs")
+        db.executemany(
+            "INSERT INTO recurring_costs (name, amount, description, cost_type, day) VALUES (:name, :amount, :description, :type, :day)",
+            costs,
+        )
+
+
+def set_recurring_costs_from_month(year, month):
+    """Replaces the saved recurring set with a month's fixed costs; returns how many were saved."""
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM recurring_costs")
+        return db.execute(
+            "INSERT INTO recurring_costs (name, amount, description, cost_type, day) "
+            "SELECT name, amount, description, cost_type, CAST(strftime('%d', created_at) AS INTEGER) "
+            "FROM costs WHERE period = ? AND cost_type = 'fixed' ORDER BY created_at",
+            (_period(year, month),),
+        ).rowcount
+
+
 def delete_cost_by_id(cost_id):
     db = get_db()
     db.execute("DELETE FROM costs WHERE id = ?", (cost_id,))
@@ -87,8 +953,8 @@ def delete_cost_by_id(cost_id):
 def delete_costs_by_type(cost_type, year, month):
     db = get_db()
     db.execute(
-        "DELETE FROM costs WHERE cost_type = ? AND strftime('%Y', created_at) = ? AND strftime('%m', created_at) = ?",
-        (cost_type, year, month),
+        "DELETE FROM costs WHERE period = ? AND cost_type = ?",
+        (_period(year, month), cost_type),
     )
     db.commit()
 
@@ -129,6 +995,116 @@ def update_checked_status(cost_id, is_checked):
     db.commit()
 
 
+BULK_OPERATIONS = ("insert", "update", "retype", "check", "delete")
+_BULK_UPDATE_FIELDS = ("name", "amount", "description", "cost_type")
+# The date forms SQLite's date functions read, so that period is never NULL
+_BULK_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:\d{2})?$")
+
+
+def _is_number(value):
+    if isinstance(value, bool):
+        return False
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _validate_bulk_operation(op):
+    """Returns an error message for a malformed bulk operation, or None."""
+    if not isinstance(op, dict) or op.get("op") not in BULK_OPERATIONS:
+        return f"op must be one of {', '.join(BULK_OPERATIONS)}"
+    kind = op["op"]
+    if kind == "insert":
+        if not all(op.get(k) is not None for k in ("name", "amount", "type", "date")):
+            return "insert requires name, amount, type and date"
+        if not isinstance(op["name"], str) or not op["name"].strip():
+            return "name must be a non-empty string"
+        if op["type"] not in ("fixed", "variable"):
+            return "Invalid cost type"
+        if not _is_number(op["amount"]):
+            return "amount must be a number"
+        if not isinstance(op["date"], str) or not _BULK_DATE_PATTERN.match(op["date"]):
+            return "date must be an ISO date such as 2024-05-01 or 2024-05-01T12:00:00"
+        return None
+    if not isinstance(op.get("id"), int) or isinstance(op["id"], bool):
+        return f"{kind} requires an integer id"
+    if kind == "update":
+        fields = op.get("fields")
+        if not isinstance(fields, dict) or not any(k in _BULK_UPDATE_FIELDS and v is not None for k, v in fields.items()):
+            return "update requires fields with at least one of name, amount, description, cost_type"
+        if fields.get("name") is not None and (not isinstance(fields["name"], str) or not fields["name"].strip()):
+            return "name must be a non-empty string"
+        if fields.get("amount") is not None and not _is_number(fields["amount"]):
+            return "amount must be a number"
+        if fields.get("description") is not None and not isinstance(fields["description"], str):
+            return "description must be a string"
+        if fields.get("cost_type") not in (None, "fixed", "variable"):
+            return "Invalid cost type"
+    if kind == "retype" and op.get("type") not in ("fixed", "variable"):
+        return "Invalid or missing type"
+    if kind == "check" and not isinstance(op.get("is_checked"), bool):
+        return "Invalid or missing is_checked field"
+    return None
+
+
+def _bulk_statement(op):
+    """The SQL and parameters of one validated bulk operation."""
+    kind = op["op"]
+    if kind == "insert":
+        return (
+            "INSERT INTO costs (name, amount, description, cost_type, created_at) VALUES (?, ?, ?, ?, ?)",
+            (op["name"], float(op["amount"]), op.get("description"), op["type"], op["date"]),
+        )
+    if kind == "update":
+        fields = {k: v for k, v in op["fields"].items() if k in _BULK_UPDATE_FIELDS and v is not None}
+        if "amount" in fields:
+            fields["amount"] = float(fields["amount"])
+        set_clause = ", ".join(f"{key} = ?" for key in fields)
+        return f"UPDATE costs SET {set_clause} WHERE id = ?", (*fields.values(), op["id"])
+    if kind == "retype":
+        return "UPDATE costs SET cost_type = ? WHERE id = ?", (op["type"], op["id"])
+    if kind == "check":
+        return "UPDATE costs SET is_checked = ? WHERE id = ?", (1 if op["is_checked"] else 0, op["id"])
+    return "DELETE FROM costs WHERE id = ?", (op["id"],)
+
+
+def apply_bulk_operations(operations):
+    """
+    Applies a list of heterogeneous operations in a single transaction and
+    returns one {"index", "status"[, "error"]} result per operation, where
+    status is "ok", "not_found" or "invalid".
+
+    Every operation is validated before the transaction starts; the valid
+    ones then run in request order, so a later operation sees the effect of
+    an earlier one. A constraint violation fails only its own operation:
+    SQLite undoes the failing statement and the transaction carries on.
+    """
+    results = [{"index": i, "status": "ok"} for i in range(len(operations))]
+    statements = []
+    for i, op in enumerate(operations):
+        error = _validate_bulk_operation(op)
+        if error:
+            results[i].update(status="invalid", error=error)
+        else:
+            statements.append((i, op["op"], *_bulk_statement(op)))
+
+    db = get_db()
+    with db:
+        # Taken before the first statement so that no other writer runs in between
+        db.execute("BEGIN IMMEDIATE")
+        for i, kind, sql, params in statements:
+            try:
+                cursor = db.execute(sql, params)
+            except sqlite3.IntegrityError as e:
+                results[i].update(status="invalid", error=str(e))
+                continue
+            if kind != "insert" and cursor.rowcount == 0:
+                results[i]["status"] = "not_found"
+    return results
+
+
 def get_budget(year, month):
     budget = (
         get_db()
@@ -153,20 +1129,123 @@ def save_budget(year, month, salary, savings_goal, fixed_percent, variable_perce
     db.commit()
 
 
+def get_name_type_counts(names):
+    """
+    Returns {name: {"fixed": n, "variable": m}} for the given names, i.e. how
+    often each name has been filed under each type so far. Names are keyed
+    with the same lower(trim()) the triggers use, so both sides agree on
+    which names match (SQLite's lower() folds ASCII letters only).
+    """
+    counts = {}
+    for row in get_db().execute(
+        "SELECT n.value AS name, c.cost_type, c.count FROM json_each(?) n "
+        "JOIN name_type_counts c ON c.name_key = lower(trim(n.value))",
+        (json.dumps(list(names)),),
+    ):
+        counts.setdefault(row["name"], {"fixed": 0, "variable": 0})[row["cost_type"]] = row["count"]
+    return counts
+
+
+_month_context_cache = OrderedDict()
+_month_context_lock = threading.Lock()
+MONTH_CONTEXT_CACHE_SIZE = 64
+
+
+def get_month_context(year, month, token_budget=2000, top_n=25):
+    """
+    Returns the budget and spending of one month for the chat prompt, with
+    totals computed in SQL. If listing every expense would exceed roughly
+    token_budget tokens, only the top_n largest expenses and the top_n
+    per-name aggregates are included ("compact" is then True).
+    Results are memoized per month and data version.
+    """
+    period = _period(year, month)
+    key = (ledger_path(), period, get_data_version(period), token_budget, top_n)
+    with _month_context_lock:
+        if key in _month_context_cache:
+            _month_context_cache.move_to_end(key)
+            return _month_context_cache[key]
+
+    db = get_db()
+    totals = {"fixed": {"total": 0.0, "count": 0}, "variable": {"total": 0.0, "count": 0}}
+    for row in db.execute(
+        "SELECT cost_type, total, count FROM monthly_totals WHERE year = ? AND month = ?", (period[:4], period[5:])
+    ):
+        totals[row["cost_type"]] = {"total": row["total"], "count": row["count"]}
+
+    # About four characters per token for lines like "  - Name: $1,234.00"
+    listing_chars = db.execute("SELECT COALESCE(SUM(length(name) + 16), 0) FROM costs WHERE period = ?", (period,)).fetchone()[0]
+    context = {"budget": get_budget(year, month), "totals": totals, "compact": listing_chars / 4 > token_budget}
+    if context["compact"]:
+        context["top_costs"] = [
+            dict(row)
+            for row in db.execute(
+                "SELECT name, amount, cost_type FROM costs WHERE period = ? ORDER BY amount DESC LIMIT ?", (period, top_n)
+            )
+        ]
+        context["name_totals"] = [
+            dict(row)
+            for row in db.execute(
+                "SELECT name, cost_type, COUNT(*) AS count, SUM(amount) AS total FROM costs WHERE period = ? "
+                "GROUP BY cost_type, name ORDER BY total DESC LIMIT ?",
+                (period, top_n),
+            )
+        ]
+    else:
+        context["costs"] = [
+            dict(row)
+            for row in db.execute(
+                "SELECT name, amount, cost_type FROM costs WHERE period = ? ORDER BY is_checked ASC, created_at DESC", (period,)
+            )
+        ]
+
+    with _month_context_lock:
+        _month_context_cache[key] = context
+        while len(_month_context_cache) > MONTH_CONTEXT_CACHE_SIZE:
+            _month_context_cache.popitem(last=False)
+    return context
+
+
 def get_all_budgets_history():
     query = "SELECT year, month, salary FROM budgets WHERE salary > 0 ORDER BY year, month"
     return [dict(row) for row in get_db().execute(query).fetchall()]
 
 
+def iter_costs_history():
+    query = "SELECT year, month, cost_type, total FROM monthly_totals ORDER BY year, month, cost_type"
+    return _iter_dicts(get_db().execute(query))
+
+
 def get_costs_history():
-    query = """
-        SELECT
-            strftime('%Y', created_at) as year,
-            strftime('%m', created_at) as month,
-            cost_type,
-            SUM(amount) as total
-        FROM costs
-        GROUP BY year, month, cost_type
-        ORDER BY year, month
+    return list(iter_costs_history())
+
+
+def iter_cost_columns():
+    """
+    Yields (month_index, day, is_fixed, amount) tuples for every cost, where
+    month_index is year * 12 + month - 1, in one pass over the table. Rows are
+    plain tuples so the analytics can load them straight into arrays.
     """
-    return [dict(row) for row in get_db().execute(query).fetchall()]
\ No newline at end of file
+    cursor = get_db().cursor()
+    cursor.row_factory = None
+    # Slicing the ISO timestamp is about twice as fast as the strftime behind
+    # the period column on a full scan; the GLOB skips malformed dates like period does
+    return cursor.execute(
+        """
+        SELECT CAST(substr(created_at, 1, 4) AS INTEGER) * 12 + CAST(substr(created_at, 6, 2) AS INTEGER) - 1,
+               CAST(substr(created_at, 9, 2) AS INTEGER),
+               cost_type = 'fixed',
+               amount
+        FROM costs
+        WHERE created_at GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+        """
+    )
+
+
+def iter_budget_columns():
+    """Yields (month_index, salary, savings_goal) tuples for every budget with a salary."""
+    cursor = get_db().cursor()
+    cursor.row_factory = None
+    return cursor.execute(
+        "SELECT year * 12 + month - 1, salary, savings_goal FROM budgets WHERE salary > 0 ORDER BY year, month"
+    )
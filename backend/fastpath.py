@@ -0,0 +1,110 @@
+# backend/fastpath.py
+import re
+from . import chat_memory
+from . import database
+
+# "add rent 1200 fixed", "coffee 4.50", "spent 12 on lunch", "$30 gas and 9.99 netflix"
+_LEADING_VERB = re.compile(r"^(?:please\s+)?(?:add|log|record|spent|paid|bought)\s+", re.IGNORECASE)
+_CURRENCY = r"(?:[$€£]|\b(?:eur|euros?|usd|dollars?|gbp)\b)"
+_AMOUNT = r"(?P<amount>\d{1,7}(?:[.,]\d{1,2})?)"
+_NAME = r"(?P<name>[^\W\d][\w'&.\- ]{0,60}?)"
+_TYPE = r"(?:\s+\(?(?:as\s+)?(?P<type>fixed|variable)\)?)?"
+_ITEM_PATTERNS = [
+    # coffee 4.50 / rent $1200 fixed
+    re.compile(rf"^{_NAME}\s+(?:for\s+)?{_CURRENCY}?\s*{_AMOUNT}\s*{_CURRENCY}?{_TYPE}$", re.IGNORECASE),
+    # 4.50 coffee / $12 on lunch / 1200 for rent fixed
+    re.compile(rf"^{_CURRENCY}?\s*{_AMOUNT}\s*{_CURRENCY}?\s+(?:(?:for|on)\s+)?{_NAME}{_TYPE}$", re.IGNORECASE),
+]
+# A comma followed by a digit is a decimal separator, not a list separator
+_ITEM_SEPARATOR = re.compile(r"\s*(?:,(?!\d)|;|\band\b|&)\s*", re.IGNORECASE)
+# Names starting with these are requests to change existing costs, which need the LLM
+_EDIT_WORDS = {"change", "edit", "update", "set", "rename", "delete", "remove", "move", "make", "increase", "decrease"}
+MAX_ITEMS = 10
+
+
+def parse_expense_command(message):
+    """
+    Parses simple "log these expenses" messages into a list of
+    {"name", "amount", "type"} dicts, where type is None unless the user stated it.
+    Returns None for anything that does not look like a plain expense list,
+    including questions, so the message can go to the LLM instead.
+    """
+    text = message.strip().rstrip(".!")
+    if not text or "?" in text or len(text) > 300:
+        return None
+    text = _LEADING_VERB.sub("", text)
+    parts = [p for p in _ITEM_SEPARATOR.split(text) if p]
+    if not parts or len(parts) > MAX_ITEMS:
+        return None
+
+    items = []
+    for part in parts:
+        for pattern in _ITEM_PATTERNS:
+            match = pattern.match(part.strip())
+            if match:
+                break
+        else:
+            return None
+        name = match.group("name").strip()
+        words = name.lower().split()
+        if any(ch.isdigit() for ch in name) or words[0] in _EDIT_WORDS or words[-1] in ("to", "by"):
+            return None
+        items.append({
+            "name": name[:1].upper() + name[1:],
+            "amount": float(match.group("amount").replace(",", ".")),
+            "type": match.group("type").lower() if match.group("type") else None,
+        })
+    return items
+
+
+def classify(names, min_confidence=0.8, min_count=2):
+    """
+    Picks 'fixed' or 'variable' for each name from how the same name was filed
+    before (the name_type_counts table, which triggers keep current on every
+    write). Returns None for a name without enough confident history.
+    """
+    counts = database.get_name_type_counts(set(names))
+    result = {}
+    for name in names:
+        seen = counts.get(name)
+        total = sum(seen.values()) if seen else 0
+        if total < min_count:
+            result[name] = None
+            continue
+        best = max(seen, key=seen.get)
+        result[name] = best if seen[best] / total >= min_confidence else None
+    return result
+
+
+def try_fast_path(message, session_id, min_confidence=0.8, min_count=2):
+    """
+    Returns the same payload as the LLM's create_expenses tool call when the
+    message is a plain expense list whose types are stated or confidently known,
+    otherwise None. Records the turn in the session memory like the LLM path does.
+    """
+    items = parse_expense_command(message)
+    if not items:
+        return None
+    guesses = classify([i["name"] for i in items if i["type"] is None], min_confidence, min_count)
+    expenses = []
+    for item in items:
+        cost_type = item["type"] or guesses.get(item["name"])
+        if cost_type is None:
+            return None
+        expenses.append({"name": item["name"], "amount": item["amount"], "type": cost_type, "description": None})
+
+    message_parts = ["I'm ready to log the following expenses for you:\n"]
+    for expense in expenses:
+        message_parts.append(f"- **{expense['name']}**: ${expense['amount']:.2f} ({expense['type'].capitalize()})")
+    message_parts.append("\nIs this correct?")
+
+    chat_memory.get_store().save(
+        session_id, message, f"I have proposed creating {len(expenses)} expenses and am awaiting user confirmation."
+    )
+    return {
+        "reply": "\n".join(message_parts),
+        "pending_actions": {
+            "tool_name": "create_expenses",
+            "tool_args": expenses,
+        },
+    }
@@ -0,0 +1,261 @@
+# backend/importer.py
+import csv
+import hashlib
+import io
+import itertools
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+FORMATS = ("csv", "ofx", "qif")
+EXPENSE_SIGNS = ("negative", "positive", "any")
+
+# Header names (lower-cased) that are recognized when no explicit column is given
+COLUMN_ALIASES = {
+    "name": ["name", "payee", "merchant", "counterparty", "beneficiary", "description", "details", "text"],
+    "amount": ["amount", "value", "sum", "debit", "betrag"],
+    "date": ["date", "booking date", "transaction date", "posted", "posting date", "value date", "datum"],
+    "type": ["type", "cost_type", "category"],
+    "description": ["memo", "note", "notes", "reference", "purpose", "verwendungszweck"],
+}
+
+DATE_FORMATS = ["%Y-%m-%d", "%Y%m%d", "%d.%m.%Y", "%d.%m.%y", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%Y/%m/%d"]
+
+
+class StatementError(ValueError):
+    """Raised when a statement cannot be parsed at all (as opposed to a single bad row)."""
+
+
+def detect_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension in FORMATS:
+        return extension
+    if extension == "qfx":
+        return "ofx"
+    raise StatementError(f"Cannot tell the statement format from '{filename}'")
+
+
+def parse_amount(text):
+    """Parses amounts such as '-1,234.56', '1.234,56 EUR' or '(12.00)'."""
+    text = text.strip()
+    negative = text.startswith("-") or text.endswith("-") or (text.startswith("(") and text.endswith(")"))
+    digits = re.sub(r"[^\d.,]", "", text)
+    if not digits:
+        raise ValueError(f"No amount in '{text}'")
+    # The right-most separator is the decimal one if it is followed by one or two digits
+    last_sep = max(digits.rfind(","), digits.rfind("."))
+    if last_sep != -1 and len(digits) - last_sep - 1 in (1, 2):
+        whole, fraction = digits[:last_sep], digits[last_sep + 1:]
+    else:
+        whole, fraction = digits, "0"
+    value = float(re.sub(r"[.,]", "", whole or "0") + "." + fraction)
+    return -value if negative else value
+
+
+def parse_date(text, date_format=None):
+    """Returns the date as the 'YYYY-MM-DDT12:00:00' string the frontend also stores."""
+    # Drop any time of day, e.g. '2024-01-05T10:00:00' or '05.01.2024 10:00'
+    text = re.split(r"[\sT]", text.strip(), maxsplit=1)[0]
+    formats = [date_format] if date_format else DATE_FORMATS
+    for fmt in formats:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return parsed.strftime("%Y-%m-%dT12:00:00")
+    raise ValueError(f"Unrecognized date '{text}'")
+
+
+def _fingerprint(*parts):
+    return hashlib.sha256("|".join(str(p) for p in parts).encode("utf8")).hexdigest()
+
+
+def _row_key(date, amount, name):
+    """Identifies a row without a bank-assigned id by its content."""
+    return "|".join(str(p) for p in (date, round(amount, 2), name.strip().lower()))
+
+
+def row_fingerprint(row_key, occurrence):
+    """
+    Fingerprints the occurrence-th row with this content in one statement, so
+    two genuine 4.50 coffees on one day stay distinct while re-importing the
+    same statement matches up. The importer numbers the occurrences.
+    """
+    return _fingerprint("row", row_key, occurrence)
+
+
+def _to_cost(name, amount, date, description, cost_type, expense_sign):
+    """Applies the sign convention; returns None for rows that are not expenses."""
+    if expense_sign == "negative":
+        if amount >= 0:
+            return None
+    elif expense_sign == "positive":
+        if amount <= 0:
+            return None
+    elif amount == 0:
+        return None
+    return {"name": name.strip() or "Unknown", "amount": abs(amount), "description": description or None, "type": cost_type, "date": date}
+
+
+@contextmanager
+def _text(stream, encoding="utf-8", newline=None):
+    """Decodes a binary stream without closing it when the wrapper goes away."""
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline=newline)
+    try:
+        yield text
+    finally:
+        text.detach()
+
+
+def _find_column(header, explicit, field):
+    lowered = [h.strip().lower() for h in header]
+    if explicit:
+        if explicit.strip().lower() not in lowered:
+            raise StatementError(f"Column '{explicit}' not found in the statement header")
+        return lowered.index(explicit.strip().lower())
+    for alias in COLUMN_ALIASES[field]:
+        if alias in lowered:
+            return lowered.index(alias)
+    return None
+
+
+def parse_csv(stream, stats, expense_sign="negative", default_type="variable", date_format=None, columns=None):
+    columns = columns or {}
+    with _text(stream, "utf-8-sig", newline="") as text:
+        yield from _parse_csv_rows(text, stats, expense_sign, default_type, date_format, columns)
+
+
+def _parse_csv_rows(text, stats, expense_sign, default_type, date_format, columns):
+    header_line = text.readline()
+    if not header_line:
+        return
+    delimiter = max([",", ";", "\t"], key=header_line.count)
+    reader = csv.reader(itertools.chain([header_line], text), delimiter=delimiter)
+    header = next(reader)
+
+    index = {field: _find_column(header, columns.get(field), field) for field in COLUMN_ALIASES}
+    if index["amount"] is None or index["date"] is None:
+        raise StatementError("The statement needs at least an amount and a date column")
+    if index["name"] == index["description"]:
+        index["description"] = None
+
+    for row in reader:
+        stats["rows"] += 1
+        try:
+            amount = parse_amount(row[index["amount"]])
+            date = parse_date(row[index["date"]], date_format)
+        except (IndexError, ValueError):
+            stats["invalid"] += 1
+            continue
+        name = row[index["name"]] if index["name"] is not None and index["name"] < len(row) else ""
+        description = row[index["description"]] if index["description"] is not None and index["description"] < len(row) else None
+        cost_type = default_type
+        if index["type"] is not None and index["type"] < len(row) and row[index["type"]].strip().lower() in ("fixed", "variable"):
+            cost_type = row[index["type"]].strip().lower()
+        cost = _to_cost(name, amount, date, description, cost_type, expense_sign)
+        if cost is None:
+            stats["not_expenses"] += 1
+            continue
+        cost["fingerprint"], cost["row_key"] = None, _row_key(date, amount, name)
+        yield cost
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def parse_ofx(stream, stats, expense_sign="negative", default_type="variable", date_format=None, columns=None):
+    """Reads OFX 1.x (SGML) and 2.x (XML) statements one line at a time."""
+    with _text(stream) as text:
+        yield from _parse_ofx_lines(text, stats, expense_sign, default_type)
+
+
+def _parse_ofx_lines(text, stats, expense_sign, default_type):
+    transaction = None
+    for line in text:
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if not closing:
+                    transaction = {}
+                    continue
+                if transaction is None:
+                    continue
+                stats["rows"] += 1
+                try:
+                    amount = parse_amount(transaction["TRNAMT"])
+                    date = parse_date(transaction["DTPOSTED"][:8], "%Y%m%d")
+                except (KeyError, ValueError):
+                    stats["invalid"] += 1
+                    transaction = None
+                    continue
+                name = transaction.get("NAME") or transaction.get("PAYEE") or transaction.get("MEMO", "")
+                memo = transaction.get("MEMO") if transaction.get("NAME") else None
+                cost = _to_cost(name, amount, date, memo, default_type, expense_sign)
+                if cost is None:
+                    stats["not_expenses"] += 1
+                else:
+                    fitid = transaction.get("FITID")
+                    if fitid:
+                        cost["fingerprint"], cost["row_key"] = _fingerprint("ofx", fitid), None
+                    else:
+                        cost["fingerprint"], cost["row_key"] = None, _row_key(date, amount, name)
+                    yield cost
+                transaction = None
+            elif transaction is not None and not closing and value.strip():
+                transaction[tag] = value.strip()
+
+
+def parse_qif(stream, stats, expense_sign="negative", default_type="variable", date_format=None, columns=None):
+    with _text(stream) as text:
+        yield from _parse_qif_lines(text, stats, expense_sign, default_type, date_format)
+
+
+def _parse_qif_lines(text, stats, expense_sign, default_type, date_format):
+    record = {}
+    for line in text:
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("!"):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code != "^":
+            record.setdefault(code, value)
+            continue
+        if not record:
+            continue
+        stats["rows"] += 1
+        try:
+            amount = parse_amount(record.get("T") or record["U"])
+            # QIF writes two-digit years as 1/5'24
+            date = parse_date(record["D"].replace("'", "/").replace(" ", ""), date_format)
+        except (KeyError, ValueError):
+            stats["invalid"] += 1
+            record = {}
+            continue
+        name = record.get("P") or record.get("M", "")
+        cost = _to_cost(name, amount, date, record.get("M") if record.get("P") else None, default_type, expense_sign)
+        if cost is None:
+            stats["not_expenses"] += 1
+        else:
+            cost["fingerprint"], cost["row_key"] = None, _row_key(date, amount, name)
+            yield cost
+        record = {}
+
+
+PARSERS = {"csv": parse_csv, "ofx": parse_ofx, "qif": parse_qif}
+
+
+def parse_statement(stream, fmt, stats, **options):
+    """
+    Lazily yields cost dicts (name, amount, description, type, date, fingerprint,
+    row_key) from a binary statement stream. Rows without a bank-assigned id
+    have no fingerprint yet, only a row_key for row_fingerprint.
+    Counters for skipped rows are written to stats.
+    """
+    if fmt not in PARSERS:
+        raise StatementError(f"Unsupported statement format '{fmt}'")
+    if options.get("expense_sign", "negative") not in EXPENSE_SIGNS:
+        raise StatementError(f"expense_sign must be one of {', '.join(EXPENSE_SIGNS)}")
+    if options.get("default_type", "variable") not in ("fixed", "variable"):
+        raise StatementError("Invalid cost type")
+    stats.update(rows=0, invalid=0, not_expenses=0)
+    return PARSERS[fmt](stream, stats, **options)
@@ -0,0 +1,352 @@
+# backend/jobs.py
+import json
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from flask import current_app, has_app_context
+from werkzeug.datastructures import FileStorage
+from . import metrics
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures a retry cannot fix, such as an unreadable upload."""
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  status TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  cancel_requested INTEGER NOT NULL DEFAULT 0,
+  run_after REAL NOT NULL,
+  created_at REAL NOT NULL,
+  started_at REAL,
+  heartbeat_at REAL,
+  finished_at REAL,
+  expires_at REAL,
+  result TEXT,
+  error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs (expires_at);
+"""
+
+
+class JobQueue:
+    """
+    A job queue kept in SQLite and worked off by a pool of threads, so slow
+    LLM calls run outside the web request. Uploaded files are spooled to
+    spool_dir, one directory per job.
+
+    Failed attempts are retried up to max_attempts times with exponential
+    backoff. While a job runs, its worker renews the job's lease; a running
+    job whose lease is more than lease_seconds old was abandoned by a crashed
+    worker and is picked up again, or failed once it has used up its
+    attempts. Finished jobs, with their results, are deleted result_ttl
+    seconds after they finish. Because jobs are claimed in a transaction,
+    several processes can share one queue. The database is created on first use.
+    """
+
+    def __init__(self, path, spool_dir, workers=2, max_attempts=3, backoff_seconds=2.0, result_ttl=3600,
+                 lease_seconds=600, poll_interval=1.0):
+        self.path = path
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.result_ttl = result_ttl
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._local = threading.local()
+        self._stopping = threading.Event()
+        self._running = set()
+        self._last_sweep = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def register(self, kind, handler):
+        """handler(payload, files) runs a job of this kind and returns its JSON-serializable result."""
+        self._handlers[kind] = handler
+
+    def _ensure_workers(self):
+        # Started on first use rather than at import, so forked server workers each get their own
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if not any(t.name == "job-heartbeat" for t in self._threads):
+                thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def start(self):
+        """Starts the worker threads unless they were started already."""
+        if not self._threads:
+            self._ensure_workers()
+
+    def submit(self, kind, payload=None, files=()):
+        """Queues a job and returns its id. files are FileStorage uploads, copied to the spool directory."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        stored = []
+        if files:
+            job_dir = os.path.join(self.spool_dir, job_id)
+            os.makedirs(job_dir)
+            for i, upload in enumerate(files):
+                path = os.path.join(job_dir, str(i))
+                upload.save(path)
+                stored.append({"path": path, "filename": upload.filename, "mimetype": upload.mimetype})
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO jobs (id, kind, status, payload, run_after, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, json.dumps({"args": payload or {}, "files": stored}), now, now),
+        )
+        metrics.get_registry().inc("jobs_total", (kind, "submitted"))
+        self._ensure_workers()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job's status and, once finished, its result or error; None for unknown or expired jobs."""
+        row = self._connection().execute(
+            "SELECT id, kind, status, attempts, cancel_requested, created_at, started_at, finished_at, result, error "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job at once. A running job cannot be interrupted; it is
+        marked so that its result is discarded when it completes.
+        Returns the job's new status, or None if there is no such job.
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            if row["status"] == "queued":
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ? WHERE id = ?",
+                    (now, now + self.result_ttl, job_id),
+                )
+                status = "cancelled"
+            elif row["status"] == "running":
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+                status = "running"
+            else:
+                status = row["status"]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if status == "cancelled":
+            self._remove_files(job_id)
+        return status
+
+    def counts(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def _claim(self):
+        conn = self._connection()
+        now = time.time()
+        expired_lease = now - self.lease_seconds
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Abandoned jobs that have no attempts left, or were cancelled meanwhile, are not run again
+            ended = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'failed' END, "
+                "error = CASE WHEN cancel_requested THEN NULL ELSE ? END, finished_at = ?, expires_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND (attempts >= ? OR cancel_requested) "
+                "RETURNING id, kind, status",
+                (
+                    "The worker running this job stopped responding",
+                    now, now + self.result_ttl, expired_lease, self.max_attempts,
+                ),
+            ).fetchall()
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?) OR (status = 'running' AND heartbeat_at < ?) "
+                "ORDER BY run_after LIMIT 1",
+                (now, expired_lease),
+            ).fetchone()
+            job = None
+            if row is not None:
+                job = conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, heartbeat_at = ? "
+                    "WHERE id = ? RETURNING id, kind, payload, attempts",
+                    (now, now, row["id"]),
+                ).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for ended_job in ended:
+            self._remove_files(ended_job["id"])
+            if ended_job["status"] == "failed":
+                metrics.get_registry().inc("jobs_total", (ended_job["kind"], "failed"))
+        return job
+
+    def _heartbeat(self):
+        # Renews the leases of the jobs this process runs, so a long job is not taken for abandoned
+        while not self._stopping.wait(self.lease_seconds / 3):
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                self._connection().execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND id IN (SELECT value FROM json_each(?))",
+                    (time.time(), json.dumps(running)),
+                )
+            except sqlite3.Error as e:
+                print(f"Job Queue Error: {e}")
+
+    def _finish(self, job_id, status, result=None, error=None):
+        now = time.time()
+        conn = self._connection()
+        # A cancellation requested while the job ran wins over its outcome
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE ? END, "
+            "result = CASE WHEN cancel_requested THEN NULL ELSE ? END, error = ?, finished_at = ?, expires_at = ? "
+            "WHERE id = ? AND status = 'running'",
+            (status, json.dumps(result) if result is not None else None, error, now, now + self.result_ttl, job_id),
+        )
+        self._remove_files(job_id)
+
+    def _retry(self, job_id, attempts, error):
+        # Exponential backoff with jitter: about 2s, 4s, 8s... by default
+        delay = self.backoff_seconds * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+        self._connection().execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END, "
+            "run_after = ?, error = ? WHERE id = ? AND status = 'running'",
+            (time.time() + delay, error, job_id),
+        )
+
+    def _remove_files(self, job_id):
+        shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+
+    def _run(self, job):
+        payload = json.loads(job["payload"])
+        files = []
+        start = time.perf_counter()
+        with self._lock:
+            self._running.add(job["id"])
+        try:
+            for f in payload["files"]:
+                files.append(FileStorage(stream=open(f["path"], "rb"), filename=f["filename"], content_type=f["mimetype"]))
+            result = self._handlers[job["kind"]](payload["args"], files)
+        except PermanentJobError as e:
+            self._finish(job["id"], "failed", error=str(e))
+            outcome = "failed"
+        except Exception as e:
+            print(f"Job Error ({job['kind']} {job['id']}, attempt {job['attempts']}): {e}")
+            if job["attempts"] < self.max_attempts:
+                self._retry(job["id"], job["attempts"], str(e))
+                outcome = "retried"
+            else:
+                self._finish(job["id"], "failed", error=str(e))
+                outcome = "failed"
+        else:
+            self._finish(job["id"], "succeeded", result=result)
+            outcome = "succeeded"
+        finally:
+            with self._lock:
+                self._running.discard(job["id"])
+            for f in files:
+                f.close()
+        metrics.get_registry().inc("jobs_total", (job["kind"], outcome))
+        metrics.get_registry().observe("job_duration_seconds", (job["kind"],), time.perf_counter() - start)
+
+    def _sweep(self):
+        now = time.time()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        conn = self._connection()
+        expired = [row["id"] for row in conn.execute("SELECT id FROM jobs WHERE expires_at < ?", (now,))]
+        if expired:
+            conn.execute("DELETE FROM jobs WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(expired),))
+            for job_id in expired:
+                self._remove_files(job_id)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                self._sweep()
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job Queue Error: {e}")
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def stop(self):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+
+_queue = None
+
+
+def get_queue():
+    return current_app.extensions["jobs"] if has_app_context() else _queue
+
+
+def init_app(app):
+    global _queue
+    # Nothing is opened or created here; the database and spool directory are on first use
+    _queue = app.extensions["jobs"] = JobQueue(
+        app.config["JOBS_PATH"],
+        app.config["JOBS_SPOOL_DIR"],
+        workers=app.config.get("JOBS_WORKERS", 2),
+        max_attempts=app.config.get("JOBS_MAX_ATTEMPTS", 3),
+        backoff_seconds=app.config.get("JOBS_BACKOFF_SECONDS", 2.0),
+        result_ttl=app.config.get("JOBS_RESULT_TTL", 3600),
+        lease_seconds=app.config.get("JOBS_LEASE_SECONDS", 600),
+    )
+    # Jobs left queued, or abandoned mid-run, by an earlier process are picked up
+    # once this one serves its first request, without waiting for a new submit.
+    # Importing the app (CLI commands, a server before it forks) starts nothing.
+    app.before_request(_queue.start)
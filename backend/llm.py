@@ -1,16 +1,25 @@
 # backend/llm.py
 import os
+import io
 import json
 import base64
+import tempfile
+import time
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.tools import tool
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from . import chat_memory
+from . import llm_cache
+from . import metrics
+from . import preprocess
 
 # Load environment variables from .env file
 load_dotenv()
@@ -72,26 +81,111 @@ def edit_expense(original_name: str, new_name: Optional[str] = None, new_amount:
 
 # --- LLM and Conversation Chain Setup ---
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.5, convert_system_message_to_human=True)
+MODEL_NAME = "gemini-2.5-flash"
+
+llm = ChatGoogleGenerativeAI(model=MODEL_NAME, temperature=0.5, convert_system_message_to_human=True)
 llm_with_tools = llm.bind_tools([create_expenses, edit_expense], tool_choice="auto")
-memory = ConversationBufferWindowMemory(k=4, return_messages=True)
 
 MONTH_NAMES = {
     1: "January", 2: "February", 3: "March", 4: "April", 5: "May", 6: "June",
     7: "July", 8: "August", 9: "September", 10: "October", 11: "November", 12: "December"
 }
 
-def transcribe_audio(audio_file):
+TRANSCRIBE_PROMPT = "Provide a transcript for this audio."
+
+RECOGNIZE_PROMPT = """
+    Analyze the attached document (which could be a receipt or text from a bank statement).
+    Extract all relevant expense items. For each item, determine a logical name, the amount,
+    and classify it as 'fixed' or 'variable'.
+
+    If possible, also extract a detailed `description` for the expense. For example, if it's a grocery receipt, the description could be a list of the items purchased. For a bill, it might be the service period.
+
+    Use the 'create_expenses' tool to return the data.
+    If the document contains no discernible expenses, do not call the tool.
+    """
+
+
+WAV_CHUNK_MIME_TYPE = "audio/wav"
+# Gemini rejects request payloads over about 20 MB, so larger audio goes through the File API
+INLINE_AUDIO_MAX_BYTES = 16 * 1024 * 1024
+# Uploads are kept in memory up to this size and spooled to a temp file beyond it
+SPOOL_MEMORY_BYTES = 1024 * 1024
+COPY_BLOCK_BYTES = 64 * 1024
+
+
+class AudioTooLarge(ValueError):
+    """Raised when an audio upload exceeds the configured transcription limit."""
+
+
+def _spool_upload(stream, max_bytes=None):
+    """Copies an upload into a temporary file block by block, enforcing max_bytes. Returns (file, size)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    size = 0
+    while True:
+        block = stream.read(COPY_BLOCK_BYTES)
+        if not block:
+            break
+        size += len(block)
+        if max_bytes and size > max_bytes:
+            spool.close()
+            raise AudioTooLarge(f"Audio uploads are limited to {max_bytes // (1024 * 1024)} MB.")
+        spool.write(block)
+    spool.seek(0)
+    return spool, size
+
+
+def _iter_blocks(f):
+    f.seek(0)
+    while True:
+        block = f.read(COPY_BLOCK_BYTES)
+        if not block:
+            return
+        yield block
+
+
+def _wav_duration(f):
+    """Returns the length in seconds of a PCM WAV file, or None for anything else."""
+    f.seek(0)
+    head = f.read(12)
+    f.seek(0)
+    if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(f, "rb") as reader:
+            return reader.getnframes() / reader.getframerate()
+    except (wave.Error, EOFError):
+        return None
+    finally:
+        f.seek(0)
+
+
+def _iter_wav_chunks(f, chunk_seconds, overlap_seconds):
     """
-    Transcribes the given audio file using the Gemini API.
+    Yields the WAV file as standalone WAV clips of chunk_seconds, each starting
+    overlap_seconds before the previous one ends. Only one clip is read at a time.
     """
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    prompt = "Provide a transcript for this audio."
-    audio_part = {
-        "mime_type": audio_file.mimetype,
-        "data": audio_file.read()
-    }
-    response = model.generate_content([prompt, audio_part])
+    with wave.open(f, "rb") as reader:
+        params = reader.getparams()
+        chunk_frames = int(chunk_seconds * params.framerate)
+        overlap_frames = int(overlap_seconds * params.framerate)
+        if not chunk_frames > overlap_frames >= 0:
+            raise ValueError("The chunk must be longer than the overlap, which must not be negative")
+        for start in range(0, params.nframes - overlap_frames, chunk_frames - overlap_frames):
+            reader.setpos(start)
+            clip = io.BytesIO()
+            with wave.open(clip, "wb") as writer:
+                writer.setparams(params)
+                writer.writeframes(reader.readframes(chunk_frames))
+            yield clip.getvalue()
+
+
+def _generate_transcript(audio_part):
+    model = genai.GenerativeModel(MODEL_NAME)
+    with metrics.llm_call("transcribe") as call:
+        response = model.generate_content([TRANSCRIBE_PROMPT, audio_part])
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            call.record_tokens(usage.prompt_token_count, usage.candidates_token_count)
 
     if response.parts:
         return response.text
@@ -99,31 +193,213 @@ def transcribe_audio(audio_file):
         print("Transcription failed. Full response:", response)
         raise ValueError("The model did not return a valid transcription.")
 
-def recognize_expenses_from_file(file_storage):
+
+def _transcribe_uploaded(f, mime_type):
+    """Sends large audio through the File API instead of inlining it in the request."""
+    f.seek(0)
+    uploaded = genai.upload_file(f, mime_type=mime_type)
+    try:
+        while uploaded.state.name == "PROCESSING":
+            time.sleep(1)
+            uploaded = genai.get_file(uploaded.name)
+        return _generate_transcript(uploaded)
+    finally:
+        genai.delete_file(uploaded.name)
+
+
+def _transcribe_chunks(chunks, max_workers):
+    """
+    Transcribes clips concurrently and returns the texts in clip order. At most
+    twice max_workers clips are held in memory, however long the recording.
+    """
+    texts = []
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        try:
+            for chunk in chunks:
+                if len(pending) >= 2 * max_workers:
+                    texts.append(pending.popleft().result())
+                pending.append(executor.submit(_generate_transcript, {"mime_type": WAV_CHUNK_MIME_TYPE, "data": chunk}))
+            texts.extend(future.result() for future in pending)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return texts
+
+
+def _stitch_transcripts(texts, max_overlap_words=30):
+    """
+    Joins chunk transcripts in order, dropping the words at the start of each
+    chunk that repeat the end of the previous one because the audio overlapped.
+    """
+    def normalized(words):
+        return [w.strip(".,!?;:\"'").lower() for w in words]
+
+    words = []
+    for text in texts:
+        new_words = text.split()
+        tail = normalized(words[-max_overlap_words:])
+        head = normalized(new_words[:max_overlap_words])
+        for n in range(min(len(tail), len(head)), 0, -1):
+            if tail[-n:] == head[:n]:
+                new_words = new_words[n:]
+                break
+        words.extend(new_words)
+    return " ".join(words)
+
+
+def transcribe_audio(audio_file, max_bytes=None, chunk_seconds=60, overlap_seconds=2, max_workers=4):
+    """
+    Transcribes the given audio file using the Gemini API.
+    The upload is spooled to a temporary file instead of being read into memory.
+    WAV recordings longer than chunk_seconds are split into overlapping chunks
+    that are transcribed concurrently and stitched back together in order.
+    Identical recordings are answered from the result cache.
+    """
+    mime_type = audio_file.mimetype
+    spool, size = _spool_upload(audio_file.stream, max_bytes)
+    with spool:
+        cache = llm_cache.get_cache()
+        key = llm_cache.make_key("transcribe", _iter_blocks(spool), mime_type, MODEL_NAME, TRANSCRIBE_PROMPT)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        duration = _wav_duration(spool)
+        if duration is not None and duration > chunk_seconds:
+            texts = _transcribe_chunks(_iter_wav_chunks(spool, chunk_seconds, overlap_seconds), max_workers)
+            transcript = _stitch_transcripts(texts)
+        elif size > INLINE_AUDIO_MAX_BYTES:
+            transcript = _transcribe_uploaded(spool, mime_type)
+        else:
+            transcript = _generate_transcript({"mime_type": mime_type, "data": spool.read()})
+
+    cache.set(key, transcript)
+    return transcript
+
+
+def recognize_expenses_from_file(file_storage, max_workers=4):
     """
     Recognizes expenses from an uploaded file using Gemini and LangChain.
+    The pages of a multi-page PDF are read on up to max_workers threads.
     """
-    # --- THIS IS THE MODIFIED PROMPT ---
-    prompt_text = """
-    Analyze the attached document (which could be a receipt or text from a bank statement).
-    Extract all relevant expense items. For each item, determine a logical name, the amount,
-    and classify it as 'fixed' or 'variable'.
+    return recognize_expenses(file_storage.read(), file_storage.mimetype, page_workers=max_workers)
 
-    If possible, also extract a detailed `description` for the expense. For example, if it's a grocery receipt, the description could be a list of the items purchased. For a bill, it might be the service period.
 
-    Use the 'create_expenses' tool to return the data.
-    If the document contains no discernible expenses, do not call the tool.
+def recognize_expenses_from_files(file_storages, max_workers=4):
     """
-    # --- END OF MODIFICATION ---
-    
-    file_data = file_storage.read()
-    file_mime_type = file_storage.mimetype
-    
+    Recognizes expenses from several uploaded files at once.
+    The uploads are read up front in the calling thread, then the Gemini calls
+    run on a bounded thread pool. Returns one merged reply and pending_actions
+    list plus a per-file status, so one bad file does not sink the others.
+    """
+    uploads = [(f.filename, f.read(), f.mimetype) for f in file_storages]
+    # The pool threads have no app context, so the app's cache and preprocessor are handed to them
+    cache, preprocessor = llm_cache.get_cache(), preprocess.get_preprocessor()
+
+    def recognize_one(upload):
+        filename, file_data, mime_type = upload
+        try:
+            return filename, recognize_expenses(file_data, mime_type, cache=cache, preprocessor=preprocessor), None
+        except Exception as e:
+            print(f"Recognition Error ({filename}): {e}")
+            return filename, None, "Failed to process document."
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(uploads)))) as executor:
+        outcomes = list(executor.map(recognize_one, uploads))
+
+    expenses, files = [], []
+    for filename, result, error in outcomes:
+        if error:
+            files.append({"filename": filename, "status": "error", "error": error})
+            continue
+        found = (result.get("pending_actions") or {}).get("tool_args") or []
+        expenses.extend(found)
+        saved = (result.get("preprocessing") or {}).get("saved_bytes", 0)
+        files.append({"filename": filename, "status": "ok", "expenses": len(found), "saved_bytes": saved})
+
+    failed = sum(1 for f in files if f["status"] == "error")
+    if expenses:
+        message_parts = [f"I found {len(expenses)} expenses in {len(files) - failed} of your {len(files)} documents. Here they are:\n"]
+        message_parts.extend(_format_expense_lines(expenses))
+        message_parts.append("\nShould I log these for you?")
+        reply_text = "\n".join(message_parts)
+    else:
+        reply_text = "I couldn't find any expenses in those documents. Please try different ones."
+
+    return {
+        "reply": reply_text,
+        "pending_actions": {"tool_name": "create_expenses", "tool_args": expenses} if expenses else None,
+        "files": files,
+    }
+
+
+def _format_expense_lines(expenses):
+    lines = []
+    for expense in expenses:
+        desc_part = f" (Note: *{expense.get('description', '')}*)" if expense.get('description') else ""
+        amount = float(expense.get('amount', 0))
+        lines.append(
+            f"- **{expense.get('name', 'N/A')}**: ${amount:.2f} ({expense.get('type', 'N/A').capitalize()}){desc_part}"
+        )
+    return lines
+
+
+def recognize_expenses(file_data, file_mime_type, page_workers=1, cache=None, preprocessor=None):
+    """
+    Recognizes expenses from the raw bytes of a document using Gemini and LangChain.
+    The document is shrunk by the preprocessor first; a PDF it splits into
+    pages is read page by page on up to page_workers threads.
+    Successful results are cached by content, so re-uploading a receipt costs no API call.
+    cache and preprocessor default to the app's; pass them when calling from another thread.
+    """
+    if cache is None:
+        cache = llm_cache.get_cache()
+    if preprocessor is None:
+        preprocessor = preprocess.get_preprocessor()
+    key = llm_cache.make_key(
+        "recognize", file_data, file_mime_type, MODEL_NAME, RECOGNIZE_PROMPT, preprocessor.version()
+    )
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    parts, stats = preprocessor.prepare(file_data, file_mime_type)
+    if len(parts) == 1:
+        result = _recognize_expenses_uncached(*parts[0])
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(page_workers, len(parts)))) as executor:
+            result = _merge_page_results(list(executor.map(lambda part: _recognize_expenses_uncached(*part), parts)))
+    result["preprocessing"] = stats
+    # Only cache real findings; failures and empty results may succeed on a retry
+    if result.get("pending_actions"):
+        cache.set(key, result)
+    return result
+
+
+def _merge_page_results(results):
+    expenses = [e for r in results for e in ((r.get("pending_actions") or {}).get("tool_args") or [])]
+    if not expenses:
+        return {
+            "reply": "I couldn't find any expenses in that document. Please try a different one.",
+            "pending_actions": None,
+        }
+    message_parts = [f"I found {len(expenses)} expenses on the {len(results)} pages of your document. Here they are:\n"]
+    message_parts.extend(_format_expense_lines(expenses))
+    message_parts.append("\nShould I log these for you?")
+    return {
+        "reply": "\n".join(message_parts),
+        "pending_actions": {"tool_name": "create_expenses", "tool_args": expenses},
+    }
+
+
+def _recognize_expenses_uncached(file_data, file_mime_type):
     encoded_file = base64.b64encode(file_data).decode('utf-8')
     
     message = HumanMessage(
         content=[
-            {"type": "text", "text": prompt_text},
+            {"type": "text", "text": RECOGNIZE_PROMPT},
             {
                 "type": "image_url",
                 "image_url": f"data:{file_mime_type};base64,{encoded_file}"
@@ -132,7 +408,9 @@ def recognize_expenses_from_file(file_storage):
     )
     
     llm_with_forced_tool = llm.bind_tools([create_expenses], tool_choice="create_expenses")
-    response = llm_with_forced_tool.invoke([message])
+    with metrics.llm_call("recognize") as call:
+        response = llm_with_forced_tool.invoke([message])
+        call.record_usage(response.usage_metadata)
 
     if not response.tool_calls:
         return {
@@ -147,12 +425,7 @@ def recognize_expenses_from_file(file_storage):
             
             if expenses_to_log:
                 message_parts = [f"I found {len(expenses_to_log)} expenses in your document. Here they are:\n"]
-                for expense in expenses_to_log:
-                    desc_part = f" (Note: *{expense.get('description', '')}*)" if expense.get('description') else ""
-                    amount = float(expense.get('amount', 0))
-                    message_parts.append(
-                        f"- **{expense.get('name', 'N/A')}**: ${amount:.2f} ({expense.get('type', 'N/A').capitalize()}){desc_part}"
-                    )
+                message_parts.extend(_format_expense_lines(expenses_to_log))
                 message_parts.append("\nShould I log these for you?")
                 reply_text = "\n".join(message_parts)
             else:
@@ -181,7 +454,17 @@ def _build_context_prompt(financial_context):
     month_num = financial_context.get("month")
     month_name = MONTH_NAMES.get(month_num, "N/A")
     budget = financial_context.get("budget") or {}
-    costs = financial_context.get("costs") or []
+    totals = financial_context.get("totals") or {}
+
+    if financial_context.get("compact"):
+        # A compact summary lists only some expenses, so the name may have to come from the user
+        name_rule = (
+            "1. You MUST use the 'original_name' argument to identify the expense. The 'Financial Data Summary' below "
+            "lists only some expenses: if the one the user means is listed, copy its name exactly; otherwise use the "
+            "name exactly as the user wrote it."
+        )
+    else:
+        name_rule = "1. You MUST use the 'original_name' argument to identify the expense. Get this name from the 'Financial Data Summary' below. Be precise."
 
     prompt_parts = [
         f"You are a helpful and friendly financial assistant. It is currently {month_name} {year}.",
@@ -196,7 +479,7 @@ def _build_context_prompt(financial_context):
 
         "--- Expense Editing Rules ---",
         "When the user asks to change, modify, or edit an existing expense, you must use the 'edit_expense' tool.",
-        "1. You MUST use the 'original_name' argument to identify the expense. Get this name from the 'Financial Data Summary' below. Be precise.",
+        name_rule,
         "2. Only include the arguments for the fields that are changing (e.g., new_amount, new_type).",
         "3. If the user is ambiguous about which expense to edit (e.g., they have two expenses named 'Coffee'), ask them to clarify before using the tool.",
         "4. After deciding to use the tool, ask the user a clear question to confirm the proposed change.",
@@ -213,10 +496,8 @@ def _build_context_prompt(financial_context):
     prompt_parts.append(f"- Monthly Income: ${salary:,.2f}")
     prompt_parts.append(f"- Monthly Savings Goal: ${savings_goal:,.2f}\n")
 
-    fixed_costs = [c for c in costs if c['cost_type'] == 'fixed']
-    variable_costs = [c for c in costs if c['cost_type'] == 'variable']
-    total_fixed = sum(c['amount'] for c in fixed_costs)
-    total_variable = sum(c['amount'] for c in variable_costs)
+    total_fixed = totals.get('fixed', {}).get('total', 0)
+    total_variable = totals.get('variable', {}).get('total', 0)
     total_spending = total_fixed + total_variable
 
     prompt_parts.append(f"**Spending:**")
@@ -224,25 +505,46 @@ def _build_context_prompt(financial_context):
     prompt_parts.append(f"- Total Variable Costs: ${total_variable:,.2f}")
     prompt_parts.append(f"- **Grand Total Spending:** ${total_spending:,.2f}\n")
 
-    if fixed_costs:
-        prompt_parts.append("Fixed Expenses List:")
-        for cost in fixed_costs:
-            prompt_parts.append(f"  - {cost['name']}: ${cost['amount']:,.2f}")
+    if financial_context.get("compact"):
+        fixed_count = totals.get('fixed', {}).get('count', 0)
+        variable_count = totals.get('variable', {}).get('count', 0)
+        prompt_parts.append(
+            f"This month has {fixed_count} fixed and {variable_count} variable expenses, too many to list. "
+            "Below are the largest ones and the totals per expense name."
+        )
+        prompt_parts.append("Largest Expenses:")
+        for cost in financial_context.get("top_costs", []):
+            prompt_parts.append(f"  - {cost['name']} ({cost['cost_type']}): ${cost['amount']:,.2f}")
+        prompt_parts.append("\nTotals per Expense Name:")
+        for entry in financial_context.get("name_totals", []):
+            prompt_parts.append(f"  - {entry['name']} ({entry['cost_type']}): {entry['count']}x, ${entry['total']:,.2f} in total")
+    else:
+        costs = financial_context.get("costs") or []
+        fixed_costs = [c for c in costs if c['cost_type'] == 'fixed']
+        variable_costs = [c for c in costs if c['cost_type'] == 'variable']
+
+        if fixed_costs:
+            prompt_parts.append("Fixed Expenses List:")
+            for cost in fixed_costs:
+                prompt_parts.append(f"  - {cost['name']}: ${cost['amount']:,.2f}")
 
-    if variable_costs:
-        prompt_parts.append("\nVariable Expenses List:")
-        for cost in variable_costs:
-            prompt_parts.append(f"  - {cost['name']}: ${cost['amount']:,.2f}")
+        if variable_costs:
+            prompt_parts.append("\nVariable Expenses List:")
+            for cost in variable_costs:
+                prompt_parts.append(f"  - {cost['name']}: ${cost['amount']:,.2f}")
 
     prompt_parts.append("\n------------------------------\n")
     return "\n".join(prompt_parts)
 
 
-def get_chat_response(user_input, financial_context):
-    """
-    Gets a response from the LLM, including financial data and tool-use capability.
-    """
-    chat_history = memory.load_memory_variables({}).get("history", [])
+def _load_chat_history(session_id):
+    history = []
+    for user_input, output in chat_memory.get_store().load(session_id):
+        history.extend([HumanMessage(content=user_input), AIMessage(content=output)])
+    return history
+
+
+def _build_chat_chain(financial_context):
     context_prompt = _build_context_prompt(financial_context)
 
     prompt = ChatPromptTemplate.from_messages([
@@ -251,12 +553,69 @@ def get_chat_response(user_input, financial_context):
         ("human", "{input}"),
     ])
 
-    chain = prompt | llm_with_tools
+    return prompt | llm_with_tools
+
 
-    response = chain.invoke({
-        "chat_history": chat_history,
-        "input": user_input
-    })
+def get_chat_response(user_input, financial_context, session_id="default"):
+    """
+    Gets a response from the LLM, including financial data and tool-use capability.
+    The conversation history is kept per session_id.
+    """
+    chain = _build_chat_chain(financial_context)
+
+    with metrics.llm_call("chat") as call:
+        response = chain.invoke({
+            "chat_history": _load_chat_history(session_id),
+            "input": user_input
+        })
+        call.record_usage(response.usage_metadata)
+
+    return _handle_chat_response(user_input, response, session_id)
+
+
+def _chunk_text(chunk):
+    if isinstance(chunk.content, str):
+        return chunk.content
+    # Multi-part content: keep the text parts only
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in chunk.content)
+
+
+def stream_chat_response(user_input, financial_context, session_id="default"):
+    """
+    Streams a chat reply as (event, data) tuples while Gemini generates it:
+    "token" events carry text as it arrives, a "pending_actions" event carries
+    a proposed tool call, and a final "done" event carries the complete reply.
+    The turn is written to the session memory once the stream is complete.
+    """
+    chain = _build_chat_chain(financial_context)
+
+    response = None
+    with metrics.llm_call("chat_stream") as call:
+        for chunk in chain.stream({
+            "chat_history": _load_chat_history(session_id),
+            "input": user_input
+        }):
+            # Adding chunks also merges partial tool calls into response.tool_calls
+            response = chunk if response is None else response + chunk
+            text = _chunk_text(chunk)
+            if text:
+                yield "token", {"text": text}
+        if response is not None:
+            call.record_usage(response.usage_metadata)
+
+    if response is None:
+        raise ValueError("The model returned an empty stream.")
+    response.content = _chunk_text(response)
+
+    result = _handle_chat_response(user_input, response, session_id) or {"reply": response.content}
+    if result.get("pending_actions"):
+        yield "pending_actions", result
+    yield "done", {"reply": result["reply"]}
+
+
+def _handle_chat_response(user_input, response, session_id):
+    """Turns the model's reply into the API payload and records the turn in memory."""
+    memory = chat_memory.get_store()
 
     if response.tool_calls:
         tool_call = response.tool_calls[0]
@@ -275,7 +634,7 @@ def get_chat_response(user_input, financial_context):
                 reply_text = "\n".join(message_parts)
 
             memory_output_for_ai = f"I have proposed creating {len(tool_args.get('expenses', []))} expenses and am awaiting user confirmation."
-            memory.save_context({"input": user_input}, {"output": memory_output_for_ai})
+            memory.save(session_id, user_input, memory_output_for_ai)
 
             return {
                 "reply": reply_text,
@@ -297,7 +656,7 @@ def get_chat_response(user_input, financial_context):
                 reply_text = f"Should I update the expense **'{original_name}'** and change its {', '.join(changes)}? Let me know!"
 
             memory_output_for_ai = "I have proposed an edit to an expense and am awaiting user confirmation."
-            memory.save_context({"input": user_input}, {"output": memory_output_for_ai})
+            memory.save(session_id, user_input, memory_output_for_ai)
 
             return {
                 "reply": reply_text,
@@ -308,5 +667,5 @@ def get_chat_response(user_input, financial_context):
             }
 
     else:
-        memory.save_context({"input": user_input}, {"output": response.content})
+        memory.save(session_id, user_input, response.content)
         return {"reply": response.content}
\ No newline at end of file
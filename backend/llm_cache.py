@@ -0,0 +1,172 @@
+# backend/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+
+# The snapshot() stats that count events since start, as opposed to current sizes
+COUNTER_STATS = ("memory_hits", "disk_hits", "misses", "stores", "evictions")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  created_at REAL NOT NULL,
+  last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used);
+"""
+
+
+class ResultCache:
+    """
+    A two-tier cache for LLM results keyed by the hash of the input bytes.
+    The first tier is an in-process LRU; the second is an SQLite table that
+    survives restarts, is shared by all workers, and is trimmed by age (TTL)
+    and by total size, evicting the least recently used entries first.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, path=None, memory_entries=128, max_bytes=64 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = dict.fromkeys(COUNTER_STATS, 0)
+
+    def _connection(self):
+        # One connection per thread, since lookups also come from the recognition thread pool
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = (value, time.time())
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+        if self.path:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] < self.ttl:
+                conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+                value = json.loads(row[0])
+                with self._lock:
+                    self._memory[key] = (value, row[1])
+                    while len(self._memory) > self.memory_entries:
+                        self._memory.popitem(last=False)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        self._remember(key, value)
+        self._count("stores")
+        if not self.path:
+            return
+        encoded = json.dumps(value)
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, encoded, len(encoded), now, now),
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        evicted = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > self.max_bytes:
+            # Walk the least recently used entries until enough space is freed
+            excess = total - self.max_bytes
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used"):
+                victims.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+            evicted += len(victims)
+        if evicted:
+            with self._lock:
+                self.stats["evictions"] += evicted
+
+    def snapshot(self):
+        """Returns the hit/miss counters and the current tier sizes."""
+        with self._lock:
+            stats = dict(self.stats, memory_entries=len(self._memory))
+        if self.path:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            stats.update(disk_entries=entries, disk_bytes=size)
+        return stats
+
+
+def make_key(kind, data, mime_type, *versions):
+    """
+    Content address of an LLM input: the bytes, their MIME type and the prompt/model versions.
+    data may also be an iterable of byte chunks, for inputs that are not held in memory.
+    """
+    digest = hashlib.sha256()
+    for part in (kind, mime_type or "", *versions):
+        digest.update(str(part).encode("utf8"))
+        digest.update(b"\0")
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        digest.update(data)
+    else:
+        for chunk in data:
+            digest.update(chunk)
+    return f"{kind}:{digest.hexdigest()}"
+
+
+# The cache of the most recently configured app, for code outside an app context
+_cache = ResultCache()
+
+
+def get_cache():
+    return current_app.extensions["llm_cache"] if has_app_context() else _cache
+
+
+def init_app(app):
+    global _cache
+    # The SQLite file is opened, and created, on first use
+    _cache = app.extensions["llm_cache"] = ResultCache(
+        app.config.get("LLM_CACHE_PATH"),
+        memory_entries=app.config.get("LLM_CACHE_MEMORY_ENTRIES", 128),
+        max_bytes=app.config.get("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        ttl=app.config.get("LLM_CACHE_TTL", 7 * 24 * 3600),
+    )
@@ -0,0 +1,276 @@
+# backend/metrics.py
+import contextlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_STATEMENT = re.compile(r"^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|TABLE)\s+([\w\"]+))?", re.IGNORECASE | re.DOTALL)
+
+
+class Registry:
+    """
+    A minimal thread-safe store of counters, gauges and histograms, rendered in
+    the Prometheus text exposition format. Each metric is keyed by name and a
+    tuple of label values.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add(self, name, labels=(), value=1):
+        with self._lock:
+            key = (name, labels)
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            key = (name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @staticmethod
+    def _labels(names, values, extra=()):
+        pairs = list(zip(names, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    def render(self, extra=()):
+        """
+        Returns every metric as Prometheus text; extra are (name, kind, help, value)
+        tuples computed at scrape time, kind being "counter" or "gauge".
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: dict(v, counts=list(v["counts"])) for k, v in self._histograms.items()}
+
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        for store in (counters, gauges):
+            for (name, labels), value in sorted(store.items()):
+                header(name)
+                lines.append(f"{name}{self._labels(_LABEL_NAMES[name], labels)} {value}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            header(name)
+            names = _LABEL_NAMES[name]
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                lines.append(f"{name}_bucket{self._labels(names, labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{self._labels(names, labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{self._labels(names, labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{self._labels(names, labels)} {histogram['count']}")
+        for name, kind, help_text, value in extra:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Label names per metric, in the order the label values are passed
+_LABEL_NAMES = {
+    "http_requests_total": ("method", "route", "status"),
+    "http_request_duration_seconds": ("method", "route"),
+    "http_requests_in_flight": (),
+    "sql_queries_total": ("statement", "table"),
+    "sql_query_duration_seconds": ("statement", "table"),
+    "sql_slow_queries_total": ("statement", "table"),
+    "llm_calls_total": ("operation", "outcome"),
+    "llm_call_duration_seconds": ("operation",),
+    "llm_tokens_total": ("operation", "direction"),
+    "preprocess_original_bytes_total": ("kind",),
+    "preprocess_sent_bytes_total": ("kind",),
+    "jobs_total": ("kind", "outcome"),
+    "job_duration_seconds": ("kind",),
+}
+
+_registry = Registry()
+_registry.describe("http_requests_total", "counter", "Requests handled, by route and status.")
+_registry.describe("http_request_duration_seconds", "histogram", "Request latency including streamed bodies.")
+_registry.describe("http_requests_in_flight", "gauge", "Requests currently being handled.")
+_registry.describe("sql_queries_total", "counter", "SQL statements executed on pooled connections.")
+_registry.describe("sql_query_duration_seconds", "histogram", "Time spent in execute calls (up to the first row).")
+_registry.describe("sql_slow_queries_total", "counter", "Statements slower than METRICS_SLOW_QUERY_MS.")
+_registry.describe("llm_calls_total", "counter", "Model calls, by outcome (ok or error).")
+_registry.describe("llm_call_duration_seconds", "histogram", "Model call latency, including streamed replies.")
+_registry.describe("llm_tokens_total", "counter", "Tokens reported by the model, by direction (input or output).")
+_registry.describe("preprocess_original_bytes_total", "counter", "Bytes of documents uploaded for recognition.")
+_registry.describe("preprocess_sent_bytes_total", "counter", "Bytes of those documents sent to the model after preprocessing.")
+_registry.describe("jobs_total", "counter", "Background jobs submitted and attempts finished, by outcome.")
+_registry.describe("job_duration_seconds", "histogram", "Time spent running one attempt of a background job.")
+
+# Set from METRICS_SLOW_QUERY_MS by init_app; None disables slow-query logging
+_slow_query_seconds = None
+
+
+def get_registry():
+    return _registry
+
+
+def _statement_labels(sql):
+    match = _STATEMENT.match(sql)
+    if not match:
+        return ("OTHER", "")
+    return (match.group(1).upper(), (match.group(2) or "").strip('"').lower())
+
+
+def _record_query(sql, elapsed):
+    labels = _statement_labels(sql)
+    _registry.inc("sql_queries_total", labels)
+    _registry.observe("sql_query_duration_seconds", labels, elapsed)
+    if _slow_query_seconds is not None and elapsed >= _slow_query_seconds:
+        _registry.inc("sql_slow_queries_total", labels)
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(sql.split()))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """An sqlite3 cursor that counts and times every execute call."""
+
+    def execute(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql)
+        finally:
+            _record_query("SCRIPT", time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    An sqlite3 connection that counts and times every execute call, on the
+    connection and on its cursors; used as the pool's factory.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql)
+        finally:
+            _record_query("SCRIPT", time.perf_counter() - start)
+
+
+class _LLMCall:
+    def __init__(self, operation):
+        self.operation = operation
+
+    def record_tokens(self, input_tokens=None, output_tokens=None):
+        if input_tokens:
+            _registry.inc("llm_tokens_total", (self.operation, "input"), input_tokens)
+        if output_tokens:
+            _registry.inc("llm_tokens_total", (self.operation, "output"), output_tokens)
+
+    def record_usage(self, usage):
+        """Records a LangChain usage_metadata dict, ignoring responses without one."""
+        if usage:
+            self.record_tokens(usage.get("input_tokens"), usage.get("output_tokens"))
+
+
+@contextlib.contextmanager
+def llm_call(operation):
+    """Times one model call and counts it as ok or error; yields an object to report token usage to."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield _LLMCall(operation)
+        outcome = "ok"
+    finally:
+        _registry.inc("llm_calls_total", (operation, outcome))
+        _registry.observe("llm_call_duration_seconds", (operation,), time.perf_counter() - start)
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_status = 500
+    _registry.add("http_requests_in_flight")
+
+
+def _capture_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(e=None):
+    # Runs when the request context is popped, which for stream_with_context
+    # responses is after the last chunk has been sent
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    _registry.add("http_requests_in_flight", value=-1)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    _registry.inc("http_requests_total", (request.method, route, str(g.pop("metrics_status", 500))))
+    _registry.observe("http_request_duration_seconds", (request.method, route), time.perf_counter() - start)
+
+
+def init_app(app):
+    global _slow_query_seconds
+    slow_ms = app.config.get("METRICS_SLOW_QUERY_MS")
+    _slow_query_seconds = slow_ms / 1000 if slow_ms is not None else None
+    app.before_request(_start_request)
+    app.after_request(_capture_status)
+    app.teardown_request(_finish_request)
+
+
+def metrics_response(extra=()):
+    return Response(_registry.render(extra), mimetype="text/plain; version=0.0.4")
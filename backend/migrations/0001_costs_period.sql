@@ -0,0 +1,4 @@
+-- Stored YYYY-MM period so month-scoped queries can seek an index
+-- instead of evaluating strftime() for every row.
+ALTER TABLE costs ADD COLUMN period TEXT GENERATED ALWAYS AS (strftime('%Y-%m', created_at)) VIRTUAL;
+CREATE INDEX IF NOT EXISTS idx_costs_period ON costs (period, is_checked ASC, created_at DESC);
@@ -0,0 +1,46 @@
+-- Rollup of costs per month and type, maintained by triggers so the
+-- history and summary endpoints read one row per month instead of
+-- aggregating the whole costs table.
+DROP TABLE IF EXISTS monthly_totals;
+CREATE TABLE monthly_totals (
+  year TEXT NOT NULL,
+  month TEXT NOT NULL,
+  cost_type TEXT NOT NULL,
+  total REAL NOT NULL DEFAULT 0,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (year, month, cost_type)
+) WITHOUT ROWID;
+
+-- Keep monthly_totals in step with every write to costs
+-- A created_at strftime cannot read has no period; such costs stay out of the rollup
+CREATE TRIGGER costs_totals_insert AFTER INSERT ON costs WHEN NEW.period IS NOT NULL
+BEGIN
+  INSERT INTO monthly_totals (year, month, cost_type, total, count)
+  VALUES (substr(NEW.period, 1, 4), substr(NEW.period, 6, 2), NEW.cost_type, NEW.amount, 1)
+  ON CONFLICT(year, month, cost_type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
+
+CREATE TRIGGER costs_totals_delete AFTER DELETE ON costs WHEN OLD.period IS NOT NULL
+BEGIN
+  UPDATE monthly_totals SET total = total - OLD.amount, count = count - 1
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type;
+  DELETE FROM monthly_totals
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type AND count <= 0;
+END;
+
+CREATE TRIGGER costs_totals_update AFTER UPDATE OF amount, cost_type, created_at ON costs
+BEGIN
+  UPDATE monthly_totals SET total = total - OLD.amount, count = count - 1
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type;
+  DELETE FROM monthly_totals
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type AND count <= 0;
+  INSERT INTO monthly_totals (year, month, cost_type, total, count)
+  SELECT substr(NEW.period, 1, 4), substr(NEW.period, 6, 2), NEW.cost_type, NEW.amount, 1 WHERE NEW.period IS NOT NULL
+  ON CONFLICT(year, month, cost_type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
+
+INSERT INTO monthly_totals (year, month, cost_type, total, count)
+SELECT substr(period, 1, 4), substr(period, 6, 2), cost_type, SUM(amount), COUNT(*)
+FROM costs
+WHERE period IS NOT NULL
+GROUP BY period, cost_type;
@@ -0,0 +1,3 @@
+-- Supports keyset pagination over (created_at, id); id is the rowid and
+-- therefore already part of every index entry.
+CREATE INDEX IF NOT EXISTS idx_costs_created_at ON costs (created_at);
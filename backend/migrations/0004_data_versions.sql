@@ -0,0 +1,51 @@
+-- Monotonic data versions per month (YYYY-MM) and globally ('*'),
+-- bumped by triggers on every write and used to build ETags.
+CREATE TABLE IF NOT EXISTS data_versions (
+  scope TEXT PRIMARY KEY,
+  version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- A cost whose created_at has no period only bumps the global scope
+CREATE TRIGGER costs_version_insert AFTER INSERT ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT NEW.period, 1 WHERE NEW.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER costs_version_delete AFTER DELETE ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT OLD.period, 1 WHERE OLD.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER costs_version_update AFTER UPDATE ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT OLD.period, 1 WHERE OLD.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) SELECT NEW.period, 1 WHERE NEW.period IS NOT NULL AND NEW.period IS NOT OLD.period
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER budgets_version_insert AFTER INSERT ON budgets
+BEGIN
+  INSERT INTO data_versions (scope, version) VALUES (printf('%04d-%02d', NEW.year, NEW.month), 1), ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER budgets_version_update AFTER UPDATE ON budgets
+BEGIN
+  INSERT INTO data_versions (scope, version) VALUES (printf('%04d-%02d', NEW.year, NEW.month), 1), ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER budgets_version_delete AFTER DELETE ON budgets
+BEGIN
+  INSERT INTO data_versions (scope, version) VALUES (printf('%04d-%02d', OLD.year, OLD.month), 1), ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
@@ -0,0 +1,5 @@
+-- Content fingerprint of imported statement rows; re-importing an
+-- overlapping statement skips rows whose fingerprint already exists.
+-- Manually entered costs leave it NULL, which the unique index allows.
+ALTER TABLE costs ADD COLUMN fingerprint TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_costs_fingerprint ON costs (fingerprint);
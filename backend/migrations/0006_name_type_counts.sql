@@ -0,0 +1,35 @@
+-- Per-name counts of how costs were classified, maintained by triggers and
+-- used by the chat fast path to pick fixed/variable without the LLM.
+DROP TABLE IF EXISTS name_type_counts;
+CREATE TABLE name_type_counts (
+  name_key TEXT NOT NULL,
+  cost_type TEXT NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (name_key, cost_type)
+) WITHOUT ROWID;
+
+-- How often each (normalized) name was filed as fixed or variable, kept current on every write
+CREATE TRIGGER costs_names_insert AFTER INSERT ON costs
+BEGIN
+  INSERT INTO name_type_counts (name_key, cost_type, count) VALUES (lower(trim(NEW.name)), NEW.cost_type, 1)
+  ON CONFLICT(name_key, cost_type) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER costs_names_delete AFTER DELETE ON costs
+BEGIN
+  UPDATE name_type_counts SET count = count - 1 WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type;
+  DELETE FROM name_type_counts WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type AND count <= 0;
+END;
+
+CREATE TRIGGER costs_names_update AFTER UPDATE OF name, cost_type ON costs
+BEGIN
+  UPDATE name_type_counts SET count = count - 1 WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type;
+  DELETE FROM name_type_counts WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type AND count <= 0;
+  INSERT INTO name_type_counts (name_key, cost_type, count) VALUES (lower(trim(NEW.name)), NEW.cost_type, 1)
+  ON CONFLICT(name_key, cost_type) DO UPDATE SET count = count + 1;
+END;
+
+INSERT INTO name_type_counts (name_key, cost_type, count)
+SELECT lower(trim(name)), cost_type, COUNT(*)
+FROM costs
+GROUP BY lower(trim(name)), cost_type;
@@ -0,0 +1,29 @@
+-- Full-text index over names and descriptions. The text lives only in costs
+-- (external content); the triggers keep the index in step with every write.
+DROP TABLE IF EXISTS costs_fts;
+CREATE VIRTUAL TABLE costs_fts USING fts5(
+  name,
+  description,
+  content = 'costs',
+  content_rowid = 'id',
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+
+CREATE TRIGGER costs_fts_insert AFTER INSERT ON costs
+BEGIN
+  INSERT INTO costs_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER costs_fts_delete AFTER DELETE ON costs
+BEGIN
+  INSERT INTO costs_fts (costs_fts, rowid, name, description) VALUES ('delete', OLD.id, OLD.name, OLD.description);
+END;
+
+CREATE TRIGGER costs_fts_update AFTER UPDATE OF name, description ON costs
+BEGIN
+  INSERT INTO costs_fts (costs_fts, rowid, name, description) VALUES ('delete', OLD.id, OLD.name, OLD.description);
+  INSERT INTO costs_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+INSERT INTO costs_fts (costs_fts) VALUES ('rebuild');
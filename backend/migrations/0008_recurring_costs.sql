@@ -0,0 +1,16 @@
+-- Recurring costs copied forward into later months. recurrence_key links
+-- every copy of one cost (or template) across months, and the unique index
+-- keeps a month from receiving the same one twice.
+ALTER TABLE costs ADD COLUMN recurrence_key TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_costs_recurrence ON costs (recurrence_key, period) WHERE recurrence_key IS NOT NULL;
+
+-- A saved set of recurring costs that can be copied into any month
+DROP TABLE IF EXISTS recurring_costs;
+CREATE TABLE recurring_costs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL,
+  amount REAL NOT NULL,
+  description TEXT,
+  cost_type TEXT NOT NULL DEFAULT 'fixed' CHECK(cost_type IN ('fixed', 'variable')),
+  day INTEGER NOT NULL DEFAULT 1 CHECK(day BETWEEN 1 AND 31)
+);
@@ -0,0 +1,32 @@
+-- Costs whose created_at strftime cannot read have a NULL period and made
+-- the totals triggers insert a NULL year. Recreate them so those costs are
+-- left out of monthly_totals instead.
+DROP TRIGGER IF EXISTS costs_totals_insert;
+DROP TRIGGER IF EXISTS costs_totals_delete;
+DROP TRIGGER IF EXISTS costs_totals_update;
+
+CREATE TRIGGER costs_totals_insert AFTER INSERT ON costs WHEN NEW.period IS NOT NULL
+BEGIN
+  INSERT INTO monthly_totals (year, month, cost_type, total, count)
+  VALUES (substr(NEW.period, 1, 4), substr(NEW.period, 6, 2), NEW.cost_type, NEW.amount, 1)
+  ON CONFLICT(year, month, cost_type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
+
+CREATE TRIGGER costs_totals_delete AFTER DELETE ON costs WHEN OLD.period IS NOT NULL
+BEGIN
+  UPDATE monthly_totals SET total = total - OLD.amount, count = count - 1
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type;
+  DELETE FROM monthly_totals
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type AND count <= 0;
+END;
+
+CREATE TRIGGER costs_totals_update AFTER UPDATE OF amount, cost_type, created_at ON costs
+BEGIN
+  UPDATE monthly_totals SET total = total - OLD.amount, count = count - 1
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type;
+  DELETE FROM monthly_totals
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type AND count <= 0;
+  INSERT INTO monthly_totals (year, month, cost_type, total, count)
+  SELECT substr(NEW.period, 1, 4), substr(NEW.period, 6, 2), NEW.cost_type, NEW.amount, 1 WHERE NEW.period IS NOT NULL
+  ON CONFLICT(year, month, cost_type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
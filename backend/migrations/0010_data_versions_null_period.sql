@@ -0,0 +1,32 @@
+-- Costs whose created_at strftime cannot read have a NULL period, which the
+-- version triggers tried to store as a scope. Recreate them so such writes
+-- only bump the global scope.
+DROP TRIGGER IF EXISTS costs_version_insert;
+DROP TRIGGER IF EXISTS costs_version_delete;
+DROP TRIGGER IF EXISTS costs_version_update;
+
+CREATE TRIGGER costs_version_insert AFTER INSERT ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT NEW.period, 1 WHERE NEW.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER costs_version_delete AFTER DELETE ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT OLD.period, 1 WHERE OLD.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER costs_version_update AFTER UPDATE ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT OLD.period, 1 WHERE OLD.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) SELECT NEW.period, 1 WHERE NEW.period IS NOT NULL AND NEW.period IS NOT OLD.period
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
@@ -0,0 +1,141 @@
+# backend/preprocess.py
+import functools
+import importlib
+import io
+from flask import current_app, has_app_context
+from . import metrics
+
+PDF_MIME_TYPE = "application/pdf"
+# Formats Pillow can open that are worth re-encoding; GIFs and the like are left alone
+IMAGE_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/bmp", "image/tiff", "image/heic", "image/heif"}
+
+
+@functools.lru_cache(maxsize=None)
+def _optional(module):
+    """
+    Imports Pillow and pypdf on first use, so app startup does not pay for
+    them. Both are optional: without them uploads are sent unchanged.
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
+
+
+class Preprocessor:
+    """
+    Shrinks documents before they are sent for recognition: photos are
+    rotated upright, cropped to the document, downscaled to max_side pixels,
+    optionally turned grayscale and re-encoded as JPEG, and PDFs are split
+    into one-page documents so each page is read by its own model call.
+    A re-encoded image is only used when it is smaller than the original.
+    """
+
+    def __init__(self, max_side=1600, grayscale=True, autocrop=True, jpeg_quality=80, max_pdf_pages=10):
+        self.max_side = max_side
+        self.grayscale = grayscale
+        self.autocrop = autocrop
+        self.jpeg_quality = jpeg_quality
+        self.max_pdf_pages = max_pdf_pages
+
+    # Bumped when the output for the same settings changes, e.g. how _crop finds the border
+    REVISION = 2
+
+    def version(self):
+        """Identifies the settings, so cached recognition results change when they do."""
+        return f"{self.REVISION}:{self.max_side}:{self.grayscale}:{self.autocrop}:{self.jpeg_quality}:{self.max_pdf_pages}"
+
+    @staticmethod
+    def _crop(image):
+        Image, ImageChops = _optional("PIL.Image"), _optional("PIL.ImageChops")
+        # Only a border of the corner colour is cut away: any single pixel that clearly
+        # differs from it counts as content, so sparse or thin text is never clipped
+        gray = image.convert("L")
+        background = Image.new("L", gray.size, gray.getpixel((0, 0)))
+        box = ImageChops.difference(gray, background).point(lambda p: 255 if p > 40 else 0).getbbox()
+        if not box:
+            return image
+        margin = max(gray.size) // 50
+        box = (
+            max(box[0] - margin, 0),
+            max(box[1] - margin, 0),
+            min(box[2] + margin, gray.width),
+            min(box[3] + margin, gray.height),
+        )
+        # Only crop when it removes a real border, not a few stray pixels
+        if (box[2] - box[0]) * (box[3] - box[1]) > 0.9 * gray.width * gray.height:
+            return image
+        return image.crop(box)
+
+    def _image(self, data):
+        Image, ImageOps = _optional("PIL.Image"), _optional("PIL.ImageOps")
+        with Image.open(io.BytesIO(data)) as opened:
+            image = ImageOps.exif_transpose(opened)
+            if self.autocrop:
+                image = self._crop(image)
+            if max(image.size) > self.max_side:
+                image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            image = image.convert("L" if self.grayscale else "RGB")
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        return [(out.getvalue(), "image/jpeg")]
+
+    def _pdf(self, data):
+        pypdf = _optional("pypdf")
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        # Long documents go in one piece rather than as more calls than pages are worth
+        if not 1 < len(reader.pages) <= self.max_pdf_pages:
+            return [(data, PDF_MIME_TYPE)]
+        pages = []
+        for page in reader.pages:
+            writer = pypdf.PdfWriter()
+            writer.add_page(page)
+            out = io.BytesIO()
+            writer.write(out)
+            pages.append((out.getvalue(), PDF_MIME_TYPE))
+        return pages
+
+    def prepare(self, data, mime_type):
+        """
+        Returns ([(bytes, mime_type), ...], stats): the parts to send, one per
+        PDF page, and the original and sent sizes.
+        """
+        kind, parts = "other", None
+        try:
+            if mime_type in IMAGE_MIME_TYPES and _optional("PIL.Image") is not None:
+                kind, parts = "image", self._image(data)
+                # Re-encoding an already small JPEG can make it bigger
+                if len(parts[0][0]) >= len(data):
+                    parts = None
+            elif mime_type == PDF_MIME_TYPE and _optional("pypdf") is not None:
+                kind, parts = "pdf", self._pdf(data)
+        except Exception as e:
+            # An upload the libraries cannot read is still worth sending as-is
+            print(f"Preprocessing Error ({mime_type}): {e}")
+            parts = None
+        if parts is None:
+            parts = [(data, mime_type)]
+
+        sent = sum(len(part) for part, _ in parts)
+        stats = {"original_bytes": len(data), "sent_bytes": sent, "saved_bytes": len(data) - sent, "parts": len(parts)}
+        metrics.get_registry().inc("preprocess_original_bytes_total", (kind,), len(data))
+        metrics.get_registry().inc("preprocess_sent_bytes_total", (kind,), sent)
+        return parts, stats
+
+
+_preprocessor = Preprocessor()
+
+
+def get_preprocessor():
+    return current_app.extensions["preprocess"] if has_app_context() else _preprocessor
+
+
+def init_app(app):
+    global _preprocessor
+    _preprocessor = app.extensions["preprocess"] = Preprocessor(
+        max_side=app.config.get("RECOGNIZE_MAX_IMAGE_SIDE", 1600),
+        grayscale=app.config.get("RECOGNIZE_GRAYSCALE", True),
+        autocrop=app.config.get("RECOGNIZE_AUTOCROP", True),
+        jpeg_quality=app.config.get("RECOGNIZE_JPEG_QUALITY", 80),
+        max_pdf_pages=app.config.get("RECOGNIZE_MAX_PDF_PAGES", 10),
+    )
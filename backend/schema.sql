@@ -7,7 +7,121 @@ CREATE TABLE costs (
   description TEXT,
   cost_type TEXT NOT NULL CHECK(cost_type IN ('fixed', 'variable')),
   is_checked INTEGER NOT NULL DEFAULT 0,
-  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  period TEXT GENERATED ALWAYS AS (strftime('%Y-%m', created_at)) VIRTUAL,
+  fingerprint TEXT,
+  recurrence_key TEXT
+);
+CREATE INDEX idx_costs_period ON costs (period, is_checked ASC, created_at DESC);
+CREATE INDEX idx_costs_created_at ON costs (created_at);
+CREATE UNIQUE INDEX idx_costs_fingerprint ON costs (fingerprint);
+-- Copies of one recurring cost share a recurrence_key; a month holds at most one of each
+CREATE UNIQUE INDEX idx_costs_recurrence ON costs (recurrence_key, period) WHERE recurrence_key IS NOT NULL;
+
+DROP TABLE IF EXISTS monthly_totals;
+CREATE TABLE monthly_totals (
+  year TEXT NOT NULL,
+  month TEXT NOT NULL,
+  cost_type TEXT NOT NULL,
+  total REAL NOT NULL DEFAULT 0,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (year, month, cost_type)
+) WITHOUT ROWID;
+
+-- Keep monthly_totals in step with every write to costs
+-- A created_at strftime cannot read has no period; such costs stay out of the rollup
+CREATE TRIGGER costs_totals_insert AFTER INSERT ON costs WHEN NEW.period IS NOT NULL
+BEGIN
+  INSERT INTO monthly_totals (year, month, cost_type, total, count)
+  VALUES (substr(NEW.period, 1, 4), substr(NEW.period, 6, 2), NEW.cost_type, NEW.amount, 1)
+  ON CONFLICT(year, month, cost_type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
+
+CREATE TRIGGER costs_totals_delete AFTER DELETE ON costs WHEN OLD.period IS NOT NULL
+BEGIN
+  UPDATE monthly_totals SET total = total - OLD.amount, count = count - 1
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type;
+  DELETE FROM monthly_totals
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type AND count <= 0;
+END;
+
+CREATE TRIGGER costs_totals_update AFTER UPDATE OF amount, cost_type, created_at ON costs
+BEGIN
+  UPDATE monthly_totals SET total = total - OLD.amount, count = count - 1
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type;
+  DELETE FROM monthly_totals
+  WHERE year = substr(OLD.period, 1, 4) AND month = substr(OLD.period, 6, 2) AND cost_type = OLD.cost_type AND count <= 0;
+  INSERT INTO monthly_totals (year, month, cost_type, total, count)
+  SELECT substr(NEW.period, 1, 4), substr(NEW.period, 6, 2), NEW.cost_type, NEW.amount, 1 WHERE NEW.period IS NOT NULL
+  ON CONFLICT(year, month, cost_type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
+
+DROP TABLE IF EXISTS name_type_counts;
+CREATE TABLE name_type_counts (
+  name_key TEXT NOT NULL,
+  cost_type TEXT NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (name_key, cost_type)
+) WITHOUT ROWID;
+
+-- How often each (normalized) name was filed as fixed or variable, kept current on every write
+CREATE TRIGGER costs_names_insert AFTER INSERT ON costs
+BEGIN
+  INSERT INTO name_type_counts (name_key, cost_type, count) VALUES (lower(trim(NEW.name)), NEW.cost_type, 1)
+  ON CONFLICT(name_key, cost_type) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER costs_names_delete AFTER DELETE ON costs
+BEGIN
+  UPDATE name_type_counts SET count = count - 1 WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type;
+  DELETE FROM name_type_counts WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type AND count <= 0;
+END;
+
+CREATE TRIGGER costs_names_update AFTER UPDATE OF name, cost_type ON costs
+BEGIN
+  UPDATE name_type_counts SET count = count - 1 WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type;
+  DELETE FROM name_type_counts WHERE name_key = lower(trim(OLD.name)) AND cost_type = OLD.cost_type AND count <= 0;
+  INSERT INTO name_type_counts (name_key, cost_type, count) VALUES (lower(trim(NEW.name)), NEW.cost_type, 1)
+  ON CONFLICT(name_key, cost_type) DO UPDATE SET count = count + 1;
+END;
+
+-- Full-text index over names and descriptions. The text lives only in costs
+-- (external content); the triggers keep the index in step with every write.
+DROP TABLE IF EXISTS costs_fts;
+CREATE VIRTUAL TABLE costs_fts USING fts5(
+  name,
+  description,
+  content = 'costs',
+  content_rowid = 'id',
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+
+CREATE TRIGGER costs_fts_insert AFTER INSERT ON costs
+BEGIN
+  INSERT INTO costs_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER costs_fts_delete AFTER DELETE ON costs
+BEGIN
+  INSERT INTO costs_fts (costs_fts, rowid, name, description) VALUES ('delete', OLD.id, OLD.name, OLD.description);
+END;
+
+CREATE TRIGGER costs_fts_update AFTER UPDATE OF name, description ON costs
+BEGIN
+  INSERT INTO costs_fts (costs_fts, rowid, name, description) VALUES ('delete', OLD.id, OLD.name, OLD.description);
+  INSERT INTO costs_fts (rowid, name, description) VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+-- A saved set of recurring costs that can be copied into any month
+DROP TABLE IF EXISTS recurring_costs;
+CREATE TABLE recurring_costs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL,
+  amount REAL NOT NULL,
+  description TEXT,
+  cost_type TEXT NOT NULL DEFAULT 'fixed' CHECK(cost_type IN ('fixed', 'variable')),
+  day INTEGER NOT NULL DEFAULT 1 CHECK(day BETWEEN 1 AND 31)
 );
 
 DROP TABLE IF EXISTS budgets;
@@ -21,4 +135,56 @@ CREATE TABLE budgets (
     fixed_percent INTEGER NOT NULL DEFAULT 40,
     variable_percent INTEGER NOT NULL DEFAULT 30,
     UNIQUE(year, month)
-);
\ No newline at end of file
+);
+
+-- Not dropped on re-initialization so versions, and therefore ETags, never repeat
+CREATE TABLE IF NOT EXISTS data_versions (
+  scope TEXT PRIMARY KEY,
+  version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Bump the month's version and the global ('*') version on every write
+-- A cost whose created_at has no period only bumps the global scope
+CREATE TRIGGER costs_version_insert AFTER INSERT ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT NEW.period, 1 WHERE NEW.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER costs_version_delete AFTER DELETE ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT OLD.period, 1 WHERE OLD.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER costs_version_update AFTER UPDATE ON costs
+BEGIN
+  INSERT INTO data_versions (scope, version) SELECT OLD.period, 1 WHERE OLD.period IS NOT NULL
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) SELECT NEW.period, 1 WHERE NEW.period IS NOT NULL AND NEW.period IS NOT OLD.period
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+  INSERT INTO data_versions (scope, version) VALUES ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER budgets_version_insert AFTER INSERT ON budgets
+BEGIN
+  INSERT INTO data_versions (scope, version) VALUES (printf('%04d-%02d', NEW.year, NEW.month), 1), ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER budgets_version_update AFTER UPDATE ON budgets
+BEGIN
+  INSERT INTO data_versions (scope, version) VALUES (printf('%04d-%02d', NEW.year, NEW.month), 1), ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER budgets_version_delete AFTER DELETE ON budgets
+BEGIN
+  INSERT INTO data_versions (scope, version) VALUES (printf('%04d-%02d', OLD.year, OLD.month), 1), ('*', 1)
+  ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
@@ -0,0 +1,114 @@
+"""
+An offline stand-in for the Gemini and LangChain clients behind backend.llm.
+
+install() imports the real backend.llm and swaps its two network clients,
+the google.generativeai module used for transcription and the
+ChatGoogleGenerativeAI model used for chat and recognition, for fakes. Cache
+keys, image preprocessing, WAV chunking, prompt building and reply handling
+all run as they do in production; only the model round trip is replaced,
+by a sleep of a configurable latency.
+"""
+import os
+import time
+import types
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FAKE_EXPENSE = {"name": "Benchmark Receipt", "amount": 12.34, "type": "variable", "description": None}
+FAKE_TRANSCRIPT = "coffee four fifty"
+
+
+class FakeLLM:
+    """Holds the simulated latency and counts the model calls made."""
+
+    def __init__(self, latency=0.05, tokens=20):
+        self.latency = latency
+        self.tokens = tokens
+        self.calls = 0
+
+    def wait(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def usage(self):
+        return {"input_tokens": self.tokens * 10, "output_tokens": self.tokens, "total_tokens": self.tokens * 11}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Answers like ChatGoogleGenerativeAI: a create_expenses tool call when that
+    tool is forced (document recognition), a text reply otherwise.
+    """
+
+    fake: Any
+    tool_choice: Optional[str] = None
+
+    @property
+    def _llm_type(self):
+        return "fake-gemini"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.model_copy(update={"tool_choice": tool_choice})
+
+    def _reply(self, messages):
+        if self.tool_choice == "create_expenses":
+            return "", [{"name": "create_expenses", "args": {"expenses": [dict(FAKE_EXPENSE)]}, "id": "fake-call"}]
+        text = messages[-1].content if messages else ""
+        return f"Fake reply to: {text}", []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.fake.wait()
+        content, tool_calls = self._reply(messages)
+        message = AIMessage(content=content, tool_calls=tool_calls, usage_metadata=self.fake.usage())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.fake.calls += 1
+        for i in range(self.fake.tokens):
+            time.sleep(self.fake.latency / self.fake.tokens)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"word{i} "))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self.fake.usage()))
+
+
+class FakeGenerativeModel:
+    def __init__(self, fake, model_name):
+        self.fake = fake
+
+    def generate_content(self, contents):
+        self.fake.wait()
+        return types.SimpleNamespace(
+            parts=[FAKE_TRANSCRIPT],
+            text=FAKE_TRANSCRIPT,
+            usage_metadata=types.SimpleNamespace(
+                prompt_token_count=self.fake.tokens * 10, candidates_token_count=self.fake.tokens,
+            ),
+        )
+
+
+def _fake_genai(fake):
+    """The parts of google.generativeai that backend.llm calls."""
+    uploaded = types.SimpleNamespace(name="files/benchmark", state=types.SimpleNamespace(name="ACTIVE"))
+    return types.SimpleNamespace(
+        configure=lambda **kwargs: None,
+        GenerativeModel=lambda model_name: FakeGenerativeModel(fake, model_name),
+        upload_file=lambda f, mime_type=None: uploaded,
+        get_file=lambda name: uploaded,
+        delete_file=lambda name: None,
+    )
+
+
+def install(latency=0.05, tokens=20):
+    """Points backend.llm at fake model clients and returns the FakeLLM for inspection."""
+    # backend.llm refuses to import without a key; the fakes never send it anywhere
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+    from backend import llm
+
+    fake = FakeLLM(latency, tokens)
+    llm.genai = _fake_genai(fake)
+    llm.llm = FakeChatModel(fake=fake)
+    llm.llm_with_tools = llm.llm.bind_tools([llm.create_expenses, llm.edit_expense], tool_choice="auto")
+    llm.fake = fake
+    return fake
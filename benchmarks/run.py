@@ -0,0 +1,403 @@
+"""
+Times every database.py function and every /api/* route against synthetic
+ledgers of increasing size, with the Gemini and LangChain model clients
+replaced by offline fakes.
+
+Run from the repository root:
+
+    python -m benchmarks.run [--sizes 10000 100000 1000000] [--years 10] [--repeat 5]
+                             [--llm-latency 0.05] [--only database|routes] [--json results.json]
+
+Generated ledgers are kept in --cache-dir and reused by later runs with the
+same size, years and seed.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+import zlib
+
+from benchmarks import fake_llm, ledger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(fn, repeat, setup=None):
+    """Calls fn(*setup()) repeat times after one warm-up call and returns the samples in seconds."""
+    samples = []
+    for i in range(repeat + 1):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        if i:
+            samples.append(elapsed)
+    return samples
+
+
+def summarize(suite, name, size, samples):
+    ordered = sorted(samples)
+    return {
+        "suite": suite,
+        "name": name,
+        "size": size,
+        "runs": len(samples),
+        "median_ms": statistics.median(samples) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def ledger_path(cache_dir, size, years, seed):
+    return os.path.join(cache_dir, f"ledger-{size}-{years}y-seed{seed}.sqlite")
+
+
+def build_ledger(app, database, path, size, years, seed):
+    """Creates the ledger at path, or brings one from an earlier run up to the current schema."""
+    if os.path.exists(path):
+        app.config["DATABASE"] = path
+        with app.app_context():
+            applied = database.migrate_db()
+        app.extensions.pop("database_pools").close()
+        if applied:
+            print(f"migrated cached {size}-row ledger: {', '.join(applied)}")
+        return False
+    tmp_path = path + ".tmp"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    app.config["DATABASE"] = tmp_path
+    with app.app_context():
+        database.init_db()
+        ledger.populate(database.get_db(), size, years=years, seed=seed)
+        database.get_db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    app.extensions.pop("database_pools").close()
+    os.replace(tmp_path, path)
+    return True
+
+
+class Fixture:
+    """Rows and ids the write benchmarks create and tear down on a working copy of the ledger."""
+
+    def __init__(self, app, database, year, month):
+        self.app = app
+        self.database = database
+        self.year, self.month = year, month
+        # Writes that empty a month go to one the ledger never reaches
+        self.scratch_year = year + 100
+        self.counter = 0
+
+    def date(self, year=None):
+        return f"{year or self.year:04d}-{self.month:02d}-15T12:00:00"
+
+    def new_cost(self, year=None):
+        self.counter += 1
+        # A context of its own, so route benchmarks keep one per request like production
+        with self.app.app_context():
+            self.database.add_cost(f"Bench {self.counter}", 9.99, None, "variable", self.date(year))
+            return self.database.get_db().execute("SELECT max(id) FROM costs").fetchone()[0]
+
+    def statement(self, rows=1000):
+        self.counter += 1
+        lines = ["Date,Description,Amount"]
+        lines += [f"{self.year:04d}-{self.month:02d}-{i % 28 + 1:02d},Import {self.counter} {i},-{i % 90 + 1}.50" for i in range(rows)]
+        return io.BytesIO("\n".join(lines).encode())
+
+    def receipt(self, width=600, height=800):
+        """
+        A grayscale PNG page of ruled lines inside a wide margin, so recognition
+        runs the real crop, downscale and re-encode. One line moves with the
+        counter, so the result cache never answers it.
+        """
+        self.counter += 1
+        marked = 100 + self.counter % (height - 200)
+        rows = b"".join(
+            b"\0" + b"\xff" * 50 + (b"\x20" if y % 40 < 4 or y == marked else b"\xf0") * (width - 100) + b"\xff" * 50
+            for y in range(height)
+        )
+
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        png = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+               + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+        return io.BytesIO(png)
+
+    def recording(self, seconds=150, rate=8000):
+        """A mono 16-bit WAV long enough to be transcribed in overlapping chunks; unique like receipt()."""
+        self.counter += 1
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(rate)
+            writer.writeframes(struct.pack("<q", self.counter) + b"\0" * (seconds * rate * 2 - 8))
+        buffer.seek(0)
+        return buffer
+
+    def fill_scratch_month(self):
+        self.new_cost(self.scratch_year)
+        return ()
+
+    def clear_scratch_year(self):
+        with self.app.app_context():
+            db = self.database.get_db()
+            db.execute("DELETE FROM costs WHERE period BETWEEN ? AND ?", (f"{self.scratch_year}-01", f"{self.scratch_year}-12"))
+            db.commit()
+        return ()
+
+    def period(self, year=None):
+        return f"{year or self.year:04d}-{self.month:02d}"
+
+
+def database_cases(database, fx):
+    y, m = fx.year, fx.month
+    first_page, cursor = database.get_all_previous_costs(y, m, limit=100)
+
+    def clear_memo():
+        database._month_context_cache.clear()
+        return ()
+
+    def export(**kwargs):
+        return sum(len(chunk) for chunk in database.export_ledger(**kwargs)[1])
+
+    # The newest 1000 costs, as an incremental backup would carry them
+    last_id = database.get_db().execute("SELECT max(id) FROM costs").fetchone()[0]
+    increment = b"".join(database.export_ledger(since_id=max(last_id - 1000, 0))[1])
+
+    return [
+        ("get_all_costs(month)", lambda: database.get_all_costs(y, m), None),
+        ("get_all_costs(all)", lambda: database.get_all_costs(), None),
+        ("iter_all_costs(all)", lambda: sum(1 for _ in database.iter_all_costs()), None),
+        ("get_summary_of_months", database.get_summary_of_months, None),
+        ("get_data_version", lambda: database.get_data_version(database.month_scope(y, m)), None),
+        ("get_all_previous_costs(first page)", lambda: database.get_all_previous_costs(y, m, limit=100), None),
+        ("get_all_previous_costs(second page)", lambda: database.get_all_previous_costs(y, m, limit=100, cursor=cursor), None),
+        ("get_all_previous_costs(filtered)", lambda: database.get_all_previous_costs(y, m, cost_type="variable", name_prefix="Co"), None),
+        ("get_budget", lambda: database.get_budget(y, m), None),
+        ("save_budget", lambda: database.save_budget(y, m, 4000, 500, 40, 30), None),
+        ("get_all_budgets_history", database.get_all_budgets_history, None),
+        ("get_costs_history", database.get_costs_history, None),
+        ("search_costs(rank)", lambda: database.search_costs("netfl"), None),
+        ("search_costs(common words, date)", lambda: database.search_costs("flatmates shared", sort="date"), None),
+        ("get_name_type_counts", lambda: database.get_name_type_counts({"Coffee", "Rent", "Unknown"}), None),
+        ("get_month_context(cold)", lambda: database.get_month_context(y, m), clear_memo),
+        ("get_month_context(memoized)", lambda: database.get_month_context(y, m), None),
+        ("add_cost", lambda: database.add_cost("Bench", 9.99, None, "variable", fx.date()), None),
+        ("batch_add_costs(100)", lambda: database.batch_add_costs(
+            [{"name": f"Batch {i}", "amount": 1.5, "description": None, "type": "variable", "date": fx.date()} for i in range(100)]
+        ), None),
+        ("update_cost", lambda cid: database.update_cost(cid, {"name": "Renamed", "amount": 3.5}), lambda: (fx.new_cost(),)),
+        ("update_cost_type", lambda cid: database.update_cost_type(cid, "fixed"), lambda: (fx.new_cost(),)),
+        ("update_checked_status", lambda cid: database.update_checked_status(cid, 1), lambda: (fx.new_cost(),)),
+        ("delete_cost_by_id", database.delete_cost_by_id, lambda: (fx.new_cost(),)),
+        ("delete_costs_by_type", lambda: database.delete_costs_by_type("variable", fx.scratch_year, m),
+         fx.fill_scratch_month),
+        ("apply_bulk_operations(100)", lambda ids: database.apply_bulk_operations(
+            [{"op": "check", "id": cid, "is_checked": True} for cid in ids]
+        ), lambda: ([row["id"] for row in first_page],)),
+        ("import_statement(csv 1000)", lambda stream: database.import_statement(stream, "csv"), lambda: (fx.statement(),)),
+        ("copy_recurring_costs(12 months)", lambda: database.copy_recurring_costs(
+            fx.period(), f"{fx.scratch_year}-01", f"{fx.scratch_year}-12"
+        ), fx.clear_scratch_year),
+        ("copy_recurring_costs(idempotent re-run)", lambda: database.copy_recurring_costs(
+            fx.period(), f"{fx.scratch_year}-01", f"{fx.scratch_year}-12"
+        ), None),
+        ("export_ledger(zlib)", lambda: export(compression="zlib"), None),
+        ("export_ledger(none)", lambda: export(compression="none"), None),
+        ("restore_ledger(last 1000, upsert)", lambda: database.restore_ledger(io.BytesIO(increment)), None),
+        ("rebuild_monthly_totals", database.rebuild_monthly_totals, None),
+        ("iter_cost_columns", lambda: sum(1 for _ in database.iter_cost_columns()), None),
+    ]
+
+
+def route_cases(client, fx):
+    y, m = fx.year, fx.month
+    month_query = f"year={y}&month={m}"
+
+    def drain(response):
+        # Streamed bodies are only produced while they are read
+        body = response.get_data()
+        assert response.status_code < 400, (response.status_code, body[:200])
+        return body
+
+    def get(url, **kwargs):
+        return lambda: drain(client.get(url, **kwargs))
+
+    def send(method, url, body_of=None):
+        return lambda *args: drain(client.open(url.format(*args), method=method, json=body_of(*args) if body_of else None))
+
+    def upload(url, field, count=1):
+        return lambda: drain(client.post(
+            url, data={field: [(fx.receipt(), f"upload{i}.png", "image/png") for i in range(count)]},
+            content_type="multipart/form-data",
+        ))
+
+    def job_round_trip(url, field):
+        submit = upload(url, field)
+
+        def run():
+            job_url = f"/api/jobs/{json.loads(submit())['id']}"
+            while json.loads(drain(client.get(job_url)))["status"] in ("queued", "running"):
+                time.sleep(0.005)
+        return run
+
+    etag = client.get(f"/api/costs?{month_query}").headers["ETag"]
+    new_cost = lambda: (fx.new_cost(),)
+    chat = {"message": "how much did I spend on coffee this month", "year": y, "month": m, "session_id": "bench"}
+    cases = [
+        ("GET /api/costs (month)", get(f"/api/costs?{month_query}"), None),
+        ("GET /api/costs (month, 304)", get(f"/api/costs?{month_query}", headers={"If-None-Match": etag}), None),
+        ("GET /api/costs (month, ndjson)", get(f"/api/costs?{month_query}", headers={"Accept": "application/x-ndjson"}), None),
+        ("GET /api/costs (all)", get("/api/costs"), None),
+        ("GET /api/costs/summary", get("/api/costs/summary"), None),
+        ("GET /api/analytics", get(f"/api/analytics?{month_query}"), None),
+        ("GET /api/costs/history", get("/api/costs/history"), None),
+        ("GET /api/budgets/history", get("/api/budgets/history"), None),
+        ("GET /api/costs/all_previous", get(f"/api/costs/all_previous?{month_query}&limit=100"), None),
+        ("GET /api/costs/search (rank)", get("/api/costs/search?q=netfl"), None),
+        ("GET /api/costs/search (date, filtered)", get(
+            f"/api/costs/search?q=coffee&sort=date&cost_type=variable&start_date={y}-01-01&end_date={y}-12-31"
+        ), None),
+        ("GET /api/costs/budget", get(f"/api/costs/budget/{y}/{m}"), None),
+        ("POST /api/costs/budget", send("POST", f"/api/costs/budget/{y}/{m}", lambda: {
+            "salary": 4000, "savings_goal": 500, "fixed_percent": 40, "variable_percent": 30,
+        }), None),
+        ("POST /api/costs", send("POST", "/api/costs", lambda: {"name": "Bench", "amount": 9.99, "type": "variable", "date": fx.date()}), None),
+        ("POST /api/costs/batch_add (100)", send("POST", "/api/costs/batch_add", lambda: [
+            {"name": f"Batch {i}", "amount": 1.5, "type": "variable", "date": fx.date()} for i in range(100)
+        ]), None),
+        ("POST /api/costs/bulk (100)", send("POST", "/api/costs/bulk", lambda: [
+            {"op": "insert", "name": f"Bulk {i}", "amount": 2.5, "type": "variable", "date": fx.date()} for i in range(100)
+        ]), None),
+        ("POST /api/costs/import (csv 1000)", lambda: drain(client.post(
+            "/api/costs/import", data={"statement_file": (fx.statement(), "statement.csv")}, content_type="multipart/form-data",
+        )), None),
+        ("PUT /api/costs/<id>", send("PUT", "/api/costs/{}", lambda cid: {"name": "Renamed", "amount": 3.5}), new_cost),
+        ("PATCH /api/costs/<id>/type", send("PATCH", "/api/costs/{}/type", lambda cid: {"type": "fixed"}), new_cost),
+        ("PATCH /api/costs/<id>/checked", send("PATCH", "/api/costs/{}/checked", lambda cid: {"is_checked": True}), new_cost),
+        ("DELETE /api/costs/<id>", send("DELETE", "/api/costs/{}"), new_cost),
+        ("DELETE /api/costs/clear/<type>", send("DELETE", f"/api/costs/clear/variable?year={fx.scratch_year}&month={m}"),
+         fx.fill_scratch_month),
+        ("POST /api/costs/copy_forward (12 months)", send("POST", "/api/costs/copy_forward", lambda: {
+            "source": fx.period(), "target": f"{fx.scratch_year}-01", "through": f"{fx.scratch_year}-12",
+        }), fx.clear_scratch_year),
+        ("GET /api/export", get("/api/export"), None),
+        ("GET /api/llm/cache", get("/api/llm/cache"), None),
+        ("GET /api/metrics", get("/api/metrics"), None),
+        ("POST /api/chat (fast path)", send("POST", "/api/chat", lambda: {**chat, "message": "coffee 4.50"}), None),
+        ("POST /api/chat (llm)", send("POST", "/api/chat", lambda: chat), None),
+        ("POST /api/chat (llm, stream)", send("POST", "/api/chat", lambda: {**chat, "stream": True}), None),
+        ("POST /api/recognize (1 file)", upload("/api/recognize", "document_file"), None),
+        ("POST /api/recognize (4 files)", upload("/api/recognize", "document_file", 4), None),
+        ("POST /api/transcribe (wav, 150 s)", lambda: drain(client.post(
+            "/api/transcribe", data={"audio_file": (fx.recording(), "audio.wav", "audio/wav")},
+            content_type="multipart/form-data",
+        )), None),
+        ("POST /api/jobs/recognize (submit)", upload("/api/jobs/recognize", "document_file"), None),
+        ("POST /api/jobs/recognize (until done)", job_round_trip("/api/jobs/recognize", "document_file"), None),
+    ]
+    return cases
+
+
+def run_size(app, database, size, args):
+    path = ledger_path(args.cache_dir, size, args.years, args.seed)
+    start = time.perf_counter()
+    built = build_ledger(app, database, path, size, args.years, args.seed)
+    if built:
+        print(f"built {size}-row ledger in {time.perf_counter() - start:.1f} s")
+
+    # Benchmarks write, so they run on a throwaway copy
+    work_path = os.path.join(args.work_dir, f"work-{size}.sqlite")
+    shutil.copyfile(path, work_path)
+    app.config["DATABASE"] = work_path
+
+    # The month in the middle of the ledger
+    middle = args.years * 12 // 2
+    fx = Fixture(app, database, ledger.START_YEAR + middle // 12, middle % 12 + 1)
+    results = []
+    if args.only in (None, "database"):
+        with app.app_context():
+            for name, fn, setup in database_cases(database, fx):
+                results.append(summarize("database", name, size, measure(fn, args.repeat, setup)))
+                print(f"{size:>9} {name:<40} {results[-1]['median_ms']:10.2f} ms")
+    if args.only in (None, "routes"):
+        client = app.test_client()
+        for name, fn, setup in route_cases(client, fx):
+            results.append(summarize("routes", name, size, measure(fn, args.repeat, setup)))
+            print(f"{size:>9} {name:<40} {results[-1]['median_ms']:10.2f} ms")
+    app.extensions.pop("database_pools").close()
+    os.remove(work_path)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", choices=["database", "routes"])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds each fake model call takes.")
+    parser.add_argument("--llm-tokens", type=int, default=20, help="Tokens per fake streamed chat reply.")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "spendingtracker-bench"))
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args()
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    # Only the model clients are faked; backend.llm itself runs for real
+    fake_llm.install(args.llm_latency, args.llm_tokens)
+    from backend import database
+    from backend.app import create_app
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        args.work_dir = work_dir
+        # Every file the app writes goes to the scratch directory, never to instance/
+        app = create_app({
+            "LEDGERS_DIR": os.path.join(work_dir, "ledgers"),
+            "LLM_CACHE_PATH": os.path.join(work_dir, "llm_cache.sqlite"),
+            "JOBS_PATH": os.path.join(work_dir, "jobs.sqlite"),
+            "JOBS_SPOOL_DIR": os.path.join(work_dir, "job_files"),
+        })
+        try:
+            for size in args.sizes:
+                results.extend(run_size(app, database, size, args))
+        finally:
+            app.extensions["jobs"].stop()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "benchmark": "suite",
+                "revision": git_revision(),
+                "python": sys.version.split()[0],
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "config": {k: v for k, v in vars(args).items() if k not in ("json_path", "work_dir")},
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
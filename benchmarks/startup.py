@@ -0,0 +1,63 @@
+"""
+Measures how long a fresh interpreter takes to import backend.app, i.e. the
+cost every worker boot and `flask` CLI invocation pays, with and without
+loading the LLM stack that /api/chat, /api/recognize and /api/transcribe use.
+
+Run from the repository root:
+
+    python -m benchmarks.startup [--runs 10] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    # What the app pays now: the LLM stack stays unloaded until an LLM route is hit
+    "app_only": "import backend.app",
+    # What it paid when backend.app imported backend.llm eagerly
+    "app_with_llm": "import backend.app; import backend.llm",
+}
+
+
+def time_import(code, runs):
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "benchmark-placeholder"))
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=ROOT, env=env, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        samples = time_import(code, args.runs)
+        results[name] = {
+            "runs": args.runs,
+            "median_s": statistics.median(samples),
+            "min_s": min(samples),
+            "max_s": max(samples),
+        }
+        print(f"{name:>14}: median {results[name]['median_s'] * 1000:8.1f} ms  (min {results[name]['min_s'] * 1000:.1f} ms)")
+
+    saved = results["app_with_llm"]["median_s"] - results["app_only"]["median_s"]
+    print(f"{'saved':>14}: {saved * 1000:8.1f} ms per worker boot / CLI run")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "startup", "python": sys.version.split()[0], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const importFixedList = document.getElementById('import-fixed-list');
     const importVariableList = document.getElementById('import-variable-list');
     const importSelectedBtn = document.getElementById('import-selected-btn');
+    const importLoadMoreBtn = document.getElementById('import-load-more-btn');
+    const copyFixedCostsBtn = document.getElementById('copy-fixed-costs-btn');
     const salaryInput = document.getElementById('salary-input');
     const savingsGoalInput = document.getElementById('savings-goal-input');
     const fixedBudgetSlider = document.getElementById('fixed-budget-slider');
@@ -75,9 +77,13 @@ document.addEventListener('DOMContentLoaded', () => {
     let allCosts = [];
     let monthlySummary = [];
     let currentlyEditingId = null;
+    let previousCostsCursor = null;
     let confirmCallback = null;
     let analysisChartInstance = null;
     let lastChartData = null;
+    // One chat history per browser tab
+    const chatSessionId = sessionStorage.getItem('chatSessionId') || (window.crypto && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`);
+    sessionStorage.setItem('chatSessionId', chatSessionId);
     let lastChartTitle = null;
     let mediaRecorder;
     let isRecording = false;
@@ -201,11 +207,26 @@ document.addEventListener('DOMContentLoaded', () => {
     const updateCost = (costId, costData) => fetchAPI(`${API_URL}/${costId}`, { method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(costData) }).then(fetchAndRenderCosts);
     const updateCostType = (costId, newType) => fetchAPI(`${API_URL}/${costId}/type`, { method: 'PATCH', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ type: newType }) }).then(fetchAndRenderCosts);
 
-    const fetchAllPreviousCosts = () => {
+    // One page of costs from other months; the next page is advertised in X-Next-Cursor
+    const fetchPreviousCosts = async (cursor = null) => {
         const url = new URL(`${API_URL}/all_previous`, window.location.origin);
         url.searchParams.append('year', selectedYear);
         url.searchParams.append('month', String(selectedMonth).padStart(2, '0'));
-        return fetchAPI(url);
+        if (cursor) url.searchParams.append('cursor', cursor);
+        const response = await fetch(url);
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({ error: 'An unknown error occurred' }));
+            throw new Error(errorData.error || `Network response was not ok: ${response.statusText}`);
+        }
+        return { costs: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+    };
+
+    // Further pages are only fetched when the user asks for them
+    const loadPreviousCosts = async (append = false) => {
+        const { costs, nextCursor } = await fetchPreviousCosts(append ? previousCostsCursor : null);
+        previousCostsCursor = nextCursor;
+        renderImportModal(costs, append);
+        importLoadMoreBtn.classList.toggle('hidden', !previousCostsCursor);
     };
 
     const batchAddCosts = (costs) => {
@@ -219,13 +240,28 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
 
+    // The server copies the previous month's fixed costs; nothing is downloaded or posted back
+    const copyFixedCostsForward = () => {
+        const previous = new Date(Date.UTC(selectedYear, selectedMonth - 2, 1));
+        const source = `${previous.getUTCFullYear()}-${String(previous.getUTCMonth() + 1).padStart(2, '0')}`;
+        const target = `${selectedYear}-${String(selectedMonth).padStart(2, '0')}`;
+        return fetchAPI(`${API_URL}/copy_forward`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ source, target }),
+        }).then(() => {
+            fetchMonthlySummary();
+            fetchAndRenderCosts();
+        });
+    };
+
     const updateCheckedStatus = (costId, isChecked) => fetchAPI(`${API_URL}/${costId}/checked`, { method: 'PATCH', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ is_checked: isChecked }) });
 
-    const recognizeFile = async (file) => {
+    const recognizeFiles = async (files) => {
         const formData = new FormData();
-        formData.append('document_file', file);
+        files.forEach(file => formData.append('document_file', file));
 
-        addChatMessage("Analyzing your document, please wait...", "bot");
+        addChatMessage(files.length > 1 ? `Analyzing your ${files.length} documents, please wait...` : "Analyzing your document, please wait...", "bot");
         chatLoader.classList.remove('hidden');
 
         try {
@@ -359,11 +395,11 @@ document.addEventListener('DOMContentLoaded', () => {
         nextYearBtn.disabled = year >= currentYear;
     };
 
-    const renderImportModal = (costs) => {
-        importFixedList.innerHTML = ''; importVariableList.innerHTML = '';
+    const renderImportModal = (costs, append = false) => {
+        if (!append) { importFixedList.innerHTML = ''; importVariableList.innerHTML = ''; }
         const fixedItems = costs.filter(c => c.cost_type === 'fixed');
         const variableItems = costs.filter(c => c.cost_type === 'variable');
-        if (costs.length === 0) { importFixedList.innerHTML = '<li class="empty-list-message">Nothing to import.</li>'; return; }
+        if (costs.length === 0 && !append) { importFixedList.innerHTML = '<li class="empty-list-message">Nothing to import.</li>'; return; }
 
         const createListItem = (cost) => {
             const listItem = document.createElement('li');
@@ -609,7 +645,9 @@ document.addEventListener('DOMContentLoaded', () => {
             updateBudgetUI(budgetData);
         }
     });
-    openImportModalBtn.addEventListener('click', async () => { const previousCosts = await fetchAllPreviousCosts(); renderImportModal(previousCosts); openModal(importModal); });
+    openImportModalBtn.addEventListener('click', async () => { await loadPreviousCosts(); openModal(importModal); });
+    importLoadMoreBtn.addEventListener('click', () => loadPreviousCosts(true));
+    copyFixedCostsBtn.addEventListener('click', () => { copyFixedCostsForward(); closeModal(importModal); });
     importModalCloseBtn.addEventListener('click', () => closeModal(importModal));
     importSelectedBtn.addEventListener('click', () => {
         const selectedCheckboxes = document.querySelectorAll('#import-modal input[type="checkbox"]:checked');
@@ -654,8 +692,8 @@ document.addEventListener('DOMContentLoaded', () => {
     if(importFileBtn) { importFileBtn.addEventListener('click', () => { fileUploadInput.click(); }); }
     if(fileUploadInput) {
         fileUploadInput.addEventListener('change', (e) => {
-            const file = e.target.files[0];
-            if (file) { recognizeFile(file); }
+            const files = Array.from(e.target.files);
+            if (files.length) { recognizeFiles(files); }
             e.target.value = null;
         });
     }
@@ -767,6 +805,40 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // Reads the server-sent events of a streaming /api/chat request
+    const streamChat = async (body, onToken) => {
+        const response = await fetch('/api/chat', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body: JSON.stringify({ ...body, stream: true }),
+        });
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({ error: 'An unknown error occurred' }));
+            throw new Error(errorData.error || `Network response was not ok: ${response.statusText}`);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = {};
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const eventName = (rawEvent.match(/^event: (.*)$/m) || [])[1];
+                const data = JSON.parse((rawEvent.match(/^data: (.*)$/m) || [])[1] || '{}');
+                if (eventName === 'token') onToken(data.text);
+                else if (eventName === 'pending_actions') result = data;
+                else if (eventName === 'done') result = { ...data, ...result };
+                else if (eventName === 'error') throw new Error(data.error);
+            }
+        }
+        return result;
+    };
+
     chatForm.addEventListener('submit', async (e) => {
         e.preventDefault();
         const message = chatInput.value.trim();
@@ -777,22 +849,36 @@ document.addEventListener('DOMContentLoaded', () => {
         chatLoader.classList.remove('hidden');
         chatInput.disabled = true;
 
+        // Tokens are shown as plain text while they stream in, then replaced by the formatted reply
+        let streamedElement = null;
+        let streamedText = '';
+        const onToken = (text) => {
+            if (!streamedElement) {
+                chatLoader.classList.add('hidden');
+                streamedElement = document.createElement('div');
+                streamedElement.classList.add('chat-message', 'bot-message');
+                chatMessages.appendChild(streamedElement);
+            }
+            streamedText += text;
+            streamedElement.textContent = streamedText;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        };
+
         try {
-            const response = await fetchAPI('/api/chat', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    message: message,
-                    year: selectedYear,
-                    month: selectedMonth
-                })
-            });
+            const response = await streamChat({
+                message: message,
+                year: selectedYear,
+                month: selectedMonth,
+                session_id: chatSessionId
+            }, onToken);
+            if (streamedElement) streamedElement.remove();
             if (response.pending_actions) {
                 addConfirmationMessage(response.reply, response.pending_actions);
             } else {
                 addChatMessage(response.reply, 'bot');
             }
         } catch (error) {
+            if (streamedElement) streamedElement.remove();
             addChatMessage("Sorry, I'm having trouble connecting to my brain right now. Please try again later.", 'bot');
         } finally {
             chatLoader.classList.add('hidden');
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from backend import database
+from backend.app import create_app
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    apps = []
+
+    def make(name):
+        app = create_app({
+            "DATABASE": str(tmp_path / f"{name}.sqlite"),
+            "LEDGERS_DIR": str(tmp_path / "ledgers"),
+            "LLM_CACHE_PATH": str(tmp_path / "llm_cache.sqlite"),
+            "JOBS_PATH": str(tmp_path / "jobs.sqlite"),
+            "JOBS_SPOOL_DIR": str(tmp_path / "job_files"),
+        })
+        with app.app_context():
+            database.init_db()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.extensions["database_pools"].close()
+
+
+def _costs(app):
+    with app.app_context():
+        rows = database.get_db().execute("SELECT id, name, amount, CAST(created_at AS TEXT) FROM costs ORDER BY id")
+        return [tuple(row) for row in rows]
+
+
+def test_restore_round_trips_a_cost_with_a_non_iso_date(make_app):
+    source = make_app("source")
+    with source.app_context():
+        database.add_cost("Groceries", 42.5, None, "variable", "2024-03-05T12:00:00")
+        # Written before dates were validated; strftime cannot read it, so its period is NULL
+        db = database.get_db()
+        db.execute("INSERT INTO costs (name, amount, cost_type, created_at) VALUES ('Rent', 900, 'fixed', '05/03/2024')")
+        db.commit()
+        _, chunks = database.export_ledger()
+        exported = b"".join(chunks)
+
+    target = make_app("target")
+    # Into an empty ledger (bulk load), then again on top of it (upserts through the triggers)
+    for _ in range(2):
+        with target.app_context():
+            loaded = database.restore_ledger(io.BytesIO(exported))
+        assert loaded["costs"] == 2
+        assert _costs(target) == _costs(source)
+
+    with target.app_context():
+        totals = database.get_db().execute("SELECT year, month, cost_type, total FROM monthly_totals").fetchall()
+        assert [tuple(row) for row in totals] == [("2024", "03", "variable", 42.5)]
@@ -0,0 +1,36 @@
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+from backend.preprocess import Preprocessor
+
+
+def _ink(image):
+    histogram = image.convert("L").histogram()
+    return sum(histogram[:128])
+
+
+def test_crop_keeps_sparse_text_near_the_edges():
+    # A solid logo in the middle of the receipt, single short words close to its edges
+    image = Image.new("RGB", (1200, 2400), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((300, 800, 900, 1600), fill="black")
+    draw.text((40, 30), "ITEM", fill="black")
+    draw.text((1100, 2350), "4.50", fill="black")
+
+    cropped = Preprocessor._crop(image)
+
+    assert _ink(cropped) == _ink(image)
+
+
+def test_crop_removes_a_uniform_border():
+    image = Image.new("RGB", (1200, 2400), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(800, 1600, 40):
+        draw.text((400, y), "COFFEE 4.50", fill="black")
+
+    cropped = Preprocessor._crop(image)
+
+    assert cropped.width < image.width and cropped.height < image.height
+    assert _ink(cropped) == _ink(image)